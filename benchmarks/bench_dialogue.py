@@ -0,0 +1,62 @@
+"""
+Dialogue history formatting cost against history length.
+"""
+from benchmarks.harness import latency, measure
+from spyfall.agents.context import ContextBuilder
+from spyfall.agents.dialogue import DialogueAgent
+from spyfall.agents.local_lm import ANSWERS, QUESTIONS
+from spyfall.agents.modules.dialogue import DialogueModule
+from spyfall.environment.turn_log import TurnLog
+
+NUM_PLAYERS = 4
+AGENTS = [f"agent_{i}" for i in range(NUM_PLAYERS)]
+
+
+def turns(length: int):
+    """
+    length (agent, action_type, target, sentence) turns of alternating questions and answers.
+    """
+    for i in range(length):
+        agent, target = AGENTS[i % NUM_PLAYERS], AGENTS[(i + 1) % NUM_PLAYERS]
+        if i % 2 == 0:
+            yield agent, 0, target, f"<Player {agent}> asked <Player {target}>: {QUESTIONS[i % len(QUESTIONS)]}."
+        else:
+            yield agent, 1, target, f"<Player {agent}> answered <Player {target}>: {ANSWERS[i % len(ANSWERS)]}."
+
+
+def fill(log: TurnLog, length: int) -> TurnLog:
+    log.clear()
+    for turn in turns(length):
+        log.append(*turn)
+    return log
+
+
+def run(quick: bool = False) -> dict:
+    lengths = (8, 32, 128) if quick else (8, 32, 128, 512)
+    module = DialogueModule("agent_0", [])
+    agent = DialogueAgent("agent_0", [], None)
+    context = ContextBuilder(budget=512)
+    results = {}
+    for length in lengths:
+        log = fill(TurnLog(AGENTS), length)
+        history = list(turns(length))
+        module.format_dialogue_history(log)
+        agent.format_dialogue_history(log)
+
+        # cached rolling windows, as called on every LM request
+        results[f"module_turnlog_{length}"] = latency(measure(lambda: module.format_dialogue_history(log)))
+        results[f"agent_turnlog_{length}"] = latency(measure(lambda: agent.format_dialogue_history(log)))
+        results[f"agent_turnlog_stop_{length}"] = latency(measure(lambda: agent.format_dialogue_history(log, stop=-1)))
+        # plain lists of turn tuples, formatted from scratch
+        results[f"module_list_{length}"] = latency(measure(lambda: module.format_dialogue_history(history)))
+        results[f"agent_list_{length}"] = latency(measure(lambda: agent.format_dialogue_history(history)))
+        # a new game: every turn is appended, then the history is formatted once
+        results[f"module_turnlog_cold_{length}"] = latency(measure(lambda: module.format_dialogue_history(fill(log, length))))
+        fill(log, length)
+        results[f"context_build_{length}"] = latency(measure(lambda: context.build(log)))
+    return results
+
+
+if __name__ == "__main__":
+    for name, value in run(quick=True).items():
+        print(name, value)
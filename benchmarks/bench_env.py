@@ -0,0 +1,102 @@
+"""
+Environment throughput and action mask costs.
+"""
+import random
+import time
+
+import numpy as np
+
+from benchmarks.harness import latency, measure, throughput
+from spyfall.environment import masks
+from spyfall.environment.batched_env import BatchedSpyfallEnv
+from spyfall.environment.locations import load_catalog
+from spyfall.environment.spyfall_env import SpyfallEnv
+
+NUM_PLAYERS = 4
+OBSERVATION_DIM = 128
+
+
+def play(env: SpyfallEnv, steps: int, seed: int = 0) -> float:
+    """
+    Steps/s of env over steps random legal flat actions, resetting finished games.
+    """
+    random.seed(seed)
+    rng = np.random.default_rng(seed)
+    env.reset()
+    start = time.perf_counter()
+    for _ in range(steps):
+        legal = np.flatnonzero(env.action_masks[env.agent_selection])
+        _, _, terminations, _, _ = env.step(legal[rng.integers(len(legal))])
+        if all(terminations.values()):
+            env.reset()
+    return steps / (time.perf_counter() - start)
+
+
+def local_lm_env() -> SpyfallEnv:
+    import dspy
+    from spyfall.agents.local_lm import LocalLM
+
+    dspy.settings.configure(lm=LocalLM())
+    return SpyfallEnv(
+        NUM_PLAYERS, OBSERVATION_DIM, locations=load_catalog().to_dicts(),
+        categorical_actions=True, verbose=False
+    )
+
+
+def batched_steps(num_games: int, steps: int) -> float:
+    """
+    Game steps/s of BatchedSpyfallEnv with random action values, finished games are reset every step.
+    """
+    env = BatchedSpyfallEnv(num_games, NUM_PLAYERS, OBSERVATION_DIM, seed=0)
+    env.reset()
+    rng = np.random.default_rng(0)
+    actions = rng.random((steps, num_games, masks.NUM_ACTION_TYPES, NUM_PLAYERS))
+    game_steps = 0
+    start = time.perf_counter()
+    for action in actions:
+        game_steps += int((~env.done).sum())
+        env.step(action)
+        env.reset(np.flatnonzero(env.done))
+    return game_steps / (time.perf_counter() - start)
+
+
+def run(quick: bool = False) -> dict:
+    steps = 200 if quick else 1000
+    results = {}
+
+    results["spyfall_env_local_lm_steps_per_sec"] = throughput(play(local_lm_env(), steps // 4), "steps/s")
+    symbolic = SpyfallEnv(
+        NUM_PLAYERS, OBSERVATION_DIM, locations=load_catalog().to_dicts(), symbolic=True, categorical_actions=True
+    )
+    results["spyfall_env_symbolic_steps_per_sec"] = throughput(play(symbolic, steps * 5), "steps/s")
+    results["batched_env_1024_games_steps_per_sec"] = throughput(batched_steps(1024, steps // 10), "game steps/s")
+
+    def build_mask_table():
+        masks.action_mask_table.cache_clear()
+        masks.action_mask_table(NUM_PLAYERS)
+    results["mask_table_build"] = latency(measure(build_mask_table))
+
+    symbolic.reset()
+    agents = symbolic.possible_agents
+
+    def update_masks():
+        # ask, answer, accuse and vote transitions
+        symbolic.accused_agent = 1
+        symbolic._update_action_masks(0, agents[0], agents[1], agents[1])
+        symbolic._update_action_masks(1, agents[1], agents[0], agents[1])
+        symbolic._update_action_masks(2, agents[1], agents[2], agents[1])
+        symbolic._update_action_masks(3, agents[0], agents[2], agents[2])
+    results["spyfall_env_update_masks_x4"] = latency(measure(update_masks))
+    results["spyfall_env_write_buffers"] = latency(measure(symbolic._write_buffers))
+
+    batched = BatchedSpyfallEnv(1024, NUM_PLAYERS, OBSERVATION_DIM, seed=0)
+    batched.reset()
+    action = np.random.default_rng(0).random((1024, masks.NUM_ACTION_TYPES, NUM_PLAYERS))
+    games = batched._games
+    results["batched_env_1024_games_decode_actions"] = latency(measure(lambda: batched._get_current_action(games, action)))
+    return results
+
+
+if __name__ == "__main__":
+    for name, value in run(quick=True).items():
+        print(name, value)
@@ -0,0 +1,44 @@
+"""
+Policy and critic forward latency against batch size.
+"""
+import torch
+
+from benchmarks.harness import latency, measure
+from spyfall.models.critic import CriticNetwork
+from spyfall.models.policy import MaskedCategoricalHead, MultiAgentSpyfallNet
+
+NUM_PLAYERS = 4
+NUM_GAME_ACTIONS = 5
+OBSERVATION_DIM = 128
+
+
+def inputs(batch: int):
+    observation = torch.rand(batch, NUM_PLAYERS, OBSERVATION_DIM)
+    action_mask = torch.rand(batch, NUM_PLAYERS, NUM_GAME_ACTIONS * NUM_PLAYERS) > 0.5
+    is_spy = torch.zeros(batch, NUM_PLAYERS, dtype=torch.bool)
+    is_spy[:, 0] = True
+    return observation, action_mask, is_spy
+
+
+@torch.no_grad()
+def run(quick: bool = False) -> dict:
+    batch_sizes = (1, 64, 1024) if quick else (1, 16, 256, 1024, 4096)
+    torch.manual_seed(0)
+    policy = MultiAgentSpyfallNet(None, NUM_PLAYERS, OBSERVATION_DIM, NUM_GAME_ACTIONS).eval()
+    head = MaskedCategoricalHead(policy).eval()
+    critic = CriticNetwork(OBSERVATION_DIM, OBSERVATION_DIM * 2, use_spy=True).eval()
+    results = {}
+    for batch in batch_sizes:
+        observation, action_mask, is_spy = inputs(batch)
+        repeat = 5 if batch < 1024 else 3
+        results[f"policy_batch_{batch}"] = latency(measure(lambda: policy(observation, is_spy), repeat=repeat))
+        results[f"masked_categorical_batch_{batch}"] = latency(
+            measure(lambda: head(observation, action_mask, is_spy), repeat=repeat)
+        )
+        results[f"critic_batch_{batch}"] = latency(measure(lambda: critic(observation, is_spy), repeat=repeat))
+    return results
+
+
+if __name__ == "__main__":
+    for name, value in run(quick=True).items():
+        print(name, value)
@@ -0,0 +1,54 @@
+"""
+Overhead of the torchrl wrappers over stepping the envs directly.
+"""
+import time
+
+import torch
+
+from benchmarks.bench_env import NUM_PLAYERS, batched_steps, play
+from benchmarks.harness import result, throughput
+from spyfall.environment.locations import load_catalog
+from spyfall.environment.spyfall_env import SpyfallEnv, init_env
+from spyfall.environment.torchrl_env import SpyfallTorchRLEnv
+
+OBSERVATION_DIM = 128
+
+
+def overhead(raw_steps_per_sec: float, wrapped_steps_per_sec: float) -> dict:
+    # time per wrapped step over time per raw step
+    return result(raw_steps_per_sec / wrapped_steps_per_sec, "x", higher_is_better=False)
+
+
+def rollout_steps_per_sec(env, steps: int, per_step: int = 1) -> float:
+    env.rollout(2, break_when_any_done=False)
+    start = time.perf_counter()
+    env.rollout(steps, break_when_any_done=False)
+    return steps * per_step / (time.perf_counter() - start)
+
+
+def run(quick: bool = False) -> dict:
+    steps = 200 if quick else 1000
+    results = {}
+
+    raw = play(SpyfallEnv(
+        NUM_PLAYERS, OBSERVATION_DIM, locations=load_catalog().to_dicts(), symbolic=True, categorical_actions=True
+    ), steps)
+    wrapped_env = init_env(NUM_PLAYERS, OBSERVATION_DIM, torch.device("cpu"), symbolic=True, categorical_actions=True)
+    wrapped = rollout_steps_per_sec(wrapped_env, steps)
+    results["pettingzoo_wrapper_steps_per_sec"] = throughput(wrapped, "steps/s")
+    results["pettingzoo_wrapper_overhead"] = overhead(raw, wrapped)
+
+    num_games = 1024
+    raw = batched_steps(num_games, steps // 10)
+    native = rollout_steps_per_sec(
+        SpyfallTorchRLEnv(num_games, NUM_PLAYERS, OBSERVATION_DIM, seed=0, categorical_actions=True),
+        steps // 10, per_step=num_games
+    )
+    results["torchrl_env_1024_games_steps_per_sec"] = throughput(native, "game steps/s")
+    results["torchrl_env_1024_games_overhead"] = overhead(raw, native)
+    return results
+
+
+if __name__ == "__main__":
+    for name, value in run(quick=True).items():
+        print(name, value)
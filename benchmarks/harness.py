@@ -0,0 +1,108 @@
+"""
+Timing, result records and regression comparison for the benchmark suite.
+
+A result is {"value": float, "unit": str, "higher_is_better": bool}, keyed by
+"<suite>/<benchmark>". Suites are modules with a run(quick) function returning
+such a dict.
+"""
+import json
+import platform
+import subprocess
+import time
+from typing import Callable, Dict, List, Tuple
+
+
+def measure(fn: Callable, repeat: int = 5, min_time: float = 0.05) -> float:
+    """
+    Seconds per call of fn, the fastest of repeat runs as with timeit, since slower runs
+    measure interference rather than fn. Each run calls fn often enough to take min_time.
+    """
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+        number *= 2 if elapsed == 0 else max(2, int(min_time / elapsed) + 1)
+    times = [elapsed / number]
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        times.append((time.perf_counter() - start) / number)
+    return min(times)
+
+
+def result(value: float, unit: str, higher_is_better: bool) -> dict:
+    return {"value": float(value), "unit": unit, "higher_is_better": higher_is_better}
+
+
+def latency(seconds: float) -> dict:
+    return result(seconds * 1e6, "us", higher_is_better=False)
+
+
+def throughput(per_sec: float, unit: str) -> dict:
+    return result(per_sec, unit, higher_is_better=True)
+
+
+def metadata() -> dict:
+    import numpy
+    import torch
+
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "numpy": numpy.__version__,
+        "torch": torch.__version__,
+        "torch_threads": torch.get_num_threads(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+
+def save(path: str, results: Dict[str, dict]):
+    with open(path, "w") as f:
+        json.dump({"metadata": metadata(), "results": results}, f, indent=2, sort_keys=True)
+
+
+def load(path: str) -> Dict[str, dict]:
+    with open(path) as f:
+        return json.load(f)["results"]
+
+
+def compare(
+        current: Dict[str, dict],
+        baseline: Dict[str, dict],
+        tolerance: float
+    ) -> Tuple[List[Tuple[str, float]], List[Tuple[str, float]], List[str]]:
+    """
+    Relative change of every benchmark in both runs, positive is better.
+    Returns (regressions worse than tolerance, all changes, benchmarks of the baseline
+    that are missing or skipped in the current run).
+    """
+    changes = []
+    missing = []
+    for name, base in baseline.items():
+        if "value" not in base:
+            continue
+        new = current.get(name)
+        if new is None or "value" not in new:
+            missing.append(name)
+            continue
+        if base["value"] == 0:
+            continue
+        change = new["value"] / base["value"] - 1
+        if not base["higher_is_better"]:
+            change = base["value"] / new["value"] - 1 if new["value"] else float("inf")
+        changes.append((name, change))
+    regressions = [(name, change) for name, change in changes if change < -tolerance]
+    return regressions, changes, missing
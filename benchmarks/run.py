@@ -0,0 +1,66 @@
+"""
+Runs the benchmark suite and optionally compares it against a baseline run.
+
+Results are written as JSON keyed by "<suite>/<benchmark>". With --compare the
+exit code is 1 if any benchmark got worse than the baseline by more than the
+tolerance, or if a benchmark of the baseline is missing or skipped now, so the
+suite can gate deploys.
+usage: python -m benchmarks.run [--suites env,dialogue,models,wrapper] [--quick]
+           [--output results.json] [--compare baseline.json] [--tolerance 0.2]
+"""
+import argparse
+import importlib
+import os
+import sys
+
+from benchmarks.harness import compare, load, save
+
+SUITES = ["env", "dialogue", "models", "wrapper"]
+
+
+def run_suites(suites, quick: bool) -> dict:
+    # the dialogue layers run against the offline LM, never a remote one
+    os.environ.setdefault("SPYFALL_LM", "local")
+    results = {}
+    for suite in suites:
+        module = importlib.import_module(f"benchmarks.bench_{suite}")
+        for name, value in module.run(quick=quick).items():
+            results[f"{suite}/{name}"] = value
+            print(f"{suite}/{name}: {value['value']:.4g} {value['unit']}", flush=True)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--suites", default=",".join(SUITES))
+    parser.add_argument("--quick", action="store_true", help="fewer steps and sizes")
+    parser.add_argument("--output", default="benchmarks/results.json")
+    parser.add_argument("--compare", default=None, help="baseline results to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative slowdown")
+    args = parser.parse_args()
+
+    suites = [suite for suite in args.suites.split(",") if suite]
+    unknown = set(suites) - set(SUITES)
+    if unknown:
+        parser.error(f"unknown suites {sorted(unknown)}, choose from {SUITES}")
+
+    results = run_suites(suites, args.quick)
+    save(args.output, results)
+    print(f"wrote {args.output}")
+
+    if args.compare is None:
+        return
+    regressions, changes, missing = compare(results, load(args.compare), args.tolerance)
+    for name, change in sorted(changes, key=lambda c: c[1]):
+        print(f"{change:+7.1%} {name}")
+    if missing:
+        print(f"{len(missing)} benchmarks of the baseline missing or skipped: " + ", ".join(missing))
+    if regressions:
+        print(f"{len(regressions)} regressions beyond {args.tolerance:.0%}: " + ", ".join(name for name, _ in regressions))
+    if missing or regressions:
+        sys.exit(1)
+    print(f"no regressions beyond {args.tolerance:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Checks the import time of the core environment with python -X importtime.
+
+torch is imported first in the same interpreter as a baseline, so the check
+measures what the module adds on top of torch rather than torch and the machine.
+Fails if that takes longer than the budget or pulls in any of the lazily
+imported LM / torchrl dependencies. The import is timed in repeat fresh
+interpreters and the fastest is checked, since slower runs measure interference
+rather than the import. Run by tests/test_import_time.py.
+usage: python scripts/check_import_time.py [--module MODULE] [--budget SECONDS] [--repeat N]
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+FORBIDDEN = ["dspy", "dsp", "openai", "tiktoken", "torchrl", "tensordict", "pydantic", "dotenv", "requests"]
+BASELINE = "torch"
+
+
+def import_times(module: str) -> dict:
+    """
+    Returns {module name: cumulative import time in seconds} for a fresh interpreter
+    that imports BASELINE and then module. Modules imported by BASELINE are listed
+    under it and not counted in module's time.
+    """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {BASELINE}; import {module}"],
+        cwd=root, capture_output=True, text=True, check=True,
+    )
+    times = {}
+    after_baseline = False
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # the baseline's own imports are printed before it, only keep what module adds
+        if after_baseline:
+            times[name.strip()] = int(cumulative) / 1e6
+        after_baseline = after_baseline or name.strip() == BASELINE
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--module", default="spyfall.environment.spyfall_env")
+    # about 0.07s measured on top of torch, an eagerly imported LM stack or torchrl adds over a second
+    parser.add_argument("--budget", type=float, default=0.3, help="seconds on top of importing torch")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    times = min((import_times(args.module) for _ in range(args.repeat)), key=lambda t: t[args.module])
+    total = times[args.module]
+    forbidden = sorted({name.split(".")[0] for name in times} & set(FORBIDDEN))
+    print(f"import {args.module} after {BASELINE}: {total:.2f}s (budget {args.budget:.2f}s)")
+    for name, seconds in sorted(times.items(), key=lambda item: -item[1])[:10]:
+        print(f"  {seconds:.3f}s {name}")
+
+    failed = False
+    if total > args.budget:
+        print(f"FAIL: import took {total:.2f}s, budget is {args.budget:.2f}s")
+        failed = True
+    if forbidden:
+        print(f"FAIL: imported lazily loaded dependencies: {', '.join(forbidden)}")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
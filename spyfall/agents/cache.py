@@ -0,0 +1,171 @@
+"""
+Persistent, content-addressed cache for LM responses.
+
+Responses are keyed on the signature, the normalized inputs and a sample index.
+The sample index counts how often the same request was made in this run, so
+repeated requests, also in different games, still get distinct completions
+while a rerun or replay of the same games maps to the same keys.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "spyfall", "responses.sqlite")
+
+
+class CacheMiss(KeyError):
+    pass
+
+
+class ResponseCache:
+    """
+    SQLite backed response cache with size-based LRU eviction.
+
+    mode:
+        "readwrite": return cached responses, store new ones
+        "replay": only return cached responses, raise CacheMiss instead of calling the LM
+        "off": no storage, only sample indices are tracked
+
+    Sample counts are kept for the max_sample_counts most recently made requests.
+    A request that comes back after that many others starts from sample 0 again.
+
+    Hits update last_access in memory, the updates are written with the next put,
+    once TOUCH_BATCH of them are pending, or on close.
+    """
+    MODES = ("readwrite", "replay", "off")
+    TOUCH_BATCH = 256
+
+    def __init__(
+            self,
+            path: str = DEFAULT_CACHE_PATH,
+            max_bytes: int = 256 * 2 ** 20,
+            mode: str = "readwrite",
+            max_sample_counts: int = 1 << 16
+        ):
+        if mode not in self.MODES:
+            raise ValueError(f"Invalid cache mode: {mode}, expected one of {self.MODES}")
+        self.path = path
+        self.max_bytes = max_bytes
+        self.mode = mode
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.max_sample_counts = max_sample_counts
+        # keyed on the request digest, not the rendered prompt, in least recently made order
+        self._sample_counts: OrderedDict[bytes, int] = OrderedDict()
+        self._touched: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._db = None
+        self._total_bytes = 0
+        if mode != "off":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses "
+                "(key TEXT PRIMARY KEY, value TEXT, size INTEGER, last_access REAL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)")
+            self._db.commit()
+            self._total_bytes = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    @staticmethod
+    def normalize(inputs: dict) -> str:
+        # collapse whitespace so formatting differences map to the same key
+        return json.dumps({k: " ".join(str(v).split()) for k, v in inputs.items()}, sort_keys=True)
+
+    def next_sample_index(self, signature_name: str, inputs: dict) -> int:
+        request = hashlib.sha256((signature_name + self.normalize(inputs)).encode()).digest()
+        with self._lock:
+            sample_index = self._sample_counts.pop(request, 0)
+            self._sample_counts[request] = sample_index + 1
+            if len(self._sample_counts) > self.max_sample_counts:
+                self._sample_counts.popitem(last=False)
+        return sample_index
+
+    def reset_samples(self):
+        """
+        Starts a new run, sample indices start from 0 again.
+        """
+        with self._lock:
+            self._sample_counts.clear()
+
+    def key(self, signature_name: str, inputs: dict, sample_index: int) -> str:
+        request = f"{signature_name}\n{self.normalize(inputs)}\n{sample_index}"
+        return hashlib.sha256(request.encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[dict]:
+        if self._db is None:
+            return None
+        with self._lock:
+            row = self._db.execute("SELECT value FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                if self.mode == "replay":
+                    raise CacheMiss(key)
+                return None
+            self.hits += 1
+            self._touched[key] = time.time()
+            if len(self._touched) >= self.TOUCH_BATCH:
+                self._flush_touched()
+                self._db.commit()
+        return json.loads(row[0])
+
+    def _flush_touched(self):
+        if self._touched:
+            self._db.executemany(
+                "UPDATE responses SET last_access = ? WHERE key = ?",
+                [(last_access, key) for key, last_access in self._touched.items()],
+            )
+            self._touched.clear()
+
+    def put(self, key: str, outputs: dict):
+        if self._db is None or self.mode == "replay":
+            return
+        value = json.dumps(outputs)
+        with self._lock:
+            old = self._db.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self._total_bytes += len(value) - (old[0] if old else 0)
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, value, size, last_access) VALUES (?, ?, ?, ?)",
+                (key, value, len(value), time.time()),
+            )
+            # eviction order depends on the pending hits
+            self._flush_touched()
+            self._evict()
+            self._db.commit()
+
+    def _evict(self):
+        # drop least recently used responses until the cache fits
+        while self._total_bytes > self.max_bytes:
+            row = self._db.execute("SELECT key, size FROM responses ORDER BY last_access LIMIT 1").fetchone()
+            if row is None:
+                break
+            self._db.execute("DELETE FROM responses WHERE key = ?", (row[0],))
+            self._total_bytes -= row[1]
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        entries = 0
+        if self._db is not None:
+            with self._lock:
+                entries = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": entries,
+            "bytes": self._total_bytes,
+        }
+
+    def close(self):
+        if self._db is not None:
+            with self._lock:
+                self._flush_touched()
+                self._db.commit()
+            self._db.close()
+            self._db = None
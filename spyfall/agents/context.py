@@ -0,0 +1,144 @@
+"""
+Token-budgeted dialogue history for the dialogue signatures.
+
+Recent turns are kept verbatim, older turns are compacted to who did what to whom,
+and anything that still doesn't fit is dropped, so prompt size stays bounded no
+matter how long the game or its answers get.
+"""
+from collections import defaultdict
+from functools import lru_cache
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+from spyfall.environment.turn_log import ACTION_VERBS
+
+# rough characters per token of English text, used when tiktoken isn't installed
+CHARS_PER_TOKEN = 4
+
+
+@lru_cache(maxsize=None)
+def _encoding():
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:  # not installed, or the BPE file can't be fetched
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """
+    Token count with tiktoken's cl100k_base if available, otherwise len(text) / CHARS_PER_TOKEN.
+    """
+    encoding = _encoding()
+    if encoding is None:
+        return -(-len(text) // CHARS_PER_TOKEN)
+    return len(encoding.encode(text))
+
+
+# single turns and short inputs repeat across prompts, whole histories don't and aren't cached
+line_tokens = lru_cache(maxsize=1 << 14)(count_tokens)
+
+
+@lru_cache(maxsize=None)
+def signature_tokens(signature) -> int:
+    """
+    Tokens of a signature's instructions and field prefixes / descriptions, sent with every prompt.
+    """
+    text = signature.instructions
+    for field in signature.fields.values():
+        extra = field.json_schema_extra
+        text += f"\n{extra['prefix']} {extra['desc']}"
+    return count_tokens(text)
+
+
+class PromptStats:
+    """
+    Prompt token counts per signature.
+    """
+
+    def __init__(self):
+        self.tokens = defaultdict(list)
+
+    def record(self, name: str, tokens: int):
+        self.tokens[name].append(tokens)
+
+    def summary(self) -> Dict[str, dict]:
+        summary = {}
+        for name, tokens in self.tokens.items():
+            tokens = np.asarray(tokens)
+            summary[name] = {
+                "count": len(tokens),
+                "mean": float(tokens.mean()),
+                "p50": float(np.percentile(tokens, 50)),
+                "p99": float(np.percentile(tokens, 99)),
+                "max": int(tokens.max()),
+            }
+        return summary
+
+
+class ContextBuilder:
+    def __init__(self, budget: int = 1024, recent_turns: int = 8, max_turns: Optional[int] = 50):
+        """
+        budget: total prompt tokens, including the signature and the other inputs.
+        recent_turns: number of latest turns kept verbatim while they fit.
+        max_turns: turns considered at all, None for the whole history.
+        """
+        self.budget = budget
+        self.recent_turns = recent_turns
+        self.max_turns = max_turns
+        self.stats = PromptStats()
+
+    @staticmethod
+    def compact(turn: tuple) -> str:
+        agent, action_type, target, _ = turn
+        return f"<Player {agent}> {ACTION_VERBS[action_type]} <Player {target}>.\n"
+
+    @staticmethod
+    def omitted(turns: int) -> str:
+        return f"({turns} earlier turns omitted)\n"
+
+    def build(self, dialogue_history: Sequence[tuple], reserved: int = 0) -> str:
+        """
+        Renders the history in the format of DialogueModule.format_dialogue_history
+        within budget - reserved tokens. The latest turn is always included.
+        """
+        return self._build(dialogue_history, self.budget - reserved)[0]
+
+    def _build(self, dialogue_history: Sequence[tuple], budget: int) -> Tuple[str, int]:
+        # returns the history and its token count, summed over the cached counts of its lines
+        n = len(dialogue_history)
+        first = 0 if self.max_turns is None else max(0, n - self.max_turns)
+        # room for the omission marker while there are earlier turns left to omit
+        marker_tokens = line_tokens(self.omitted(n - first))
+        lines = []
+        used = 0
+        for i in range(n - 1, first - 1, -1):
+            turn = dialogue_history[i]
+            line = f"{turn[3]}\n" if i >= n - self.recent_turns else self.compact(turn)
+            tokens = line_tokens(line)
+            limit = budget if i == first else budget - marker_tokens
+            if used + tokens > limit and lines:
+                if i >= n - self.recent_turns:
+                    # a verbatim turn doesn't fit, try its compact form
+                    line = self.compact(turn)
+                    tokens = line_tokens(line)
+                if used + tokens > limit:
+                    lines.append(self.omitted(i - first + 1))
+                    used += marker_tokens
+                    break
+            lines.append(line)
+            used += tokens
+        return "".join(reversed(lines)), used
+
+    def fit(self, signature, inputs: dict) -> str:
+        """
+        Builds the dialogue_history input of signature around the other inputs and
+        records the resulting prompt size.
+        """
+        reserved = signature_tokens(signature) + sum(
+            line_tokens(value) for name, value in inputs.items() if name != "dialogue_history"
+        )
+        history, tokens = self._build(inputs["dialogue_history"], self.budget - reserved)
+        self.stats.record(signature.__name__, reserved + tokens)
+        return history
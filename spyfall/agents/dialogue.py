@@ -1,6 +1,18 @@
+import os
 from typing import List, Dict, Tuple
 from spyfall.agents import prompts
 
+# TurnLog format matching the loop in DialogueAgent.format_dialogue_history
+HISTORY_FORMAT = "<Player {agent_idx}>: {verb} <Player {target}>: {sentence}\n"
+
+def __getattr__(name):
+    # OPENAI_API_KEY is read from .env on first access instead of on import
+    if name == "OPENAI_API_KEY":
+        from dotenv import load_dotenv
+        load_dotenv()
+        return os.getenv("OPENAI_API_KEY")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 class GeneratorInterface:
 
     def __init__(self):
@@ -24,7 +36,11 @@ class DialogueAgent:
     def set_spy_idx(self, spy_idx):
         self.spy_idx = spy_idx
 
-    def format_dialogue_history(self, dialogue_history):
+    def format_dialogue_history(self, dialogue_history, stop=None):
+        if hasattr(dialogue_history, "render"):
+            return dialogue_history.render(fmt=HISTORY_FORMAT, stop=stop)
+        if stop is not None:
+            dialogue_history = dialogue_history[:stop]
         action_str = {0: "asked", 1: "answered", 2: "accused", 3: "voted for", 4: "guessed"}
         string = ""
         for dialogue in dialogue_history:
@@ -62,7 +78,7 @@ class DialogueAgent:
             # Get the question from the dialogue history
             if len(observation["dialogue_history"]) > 0:
                 question = observation["dialogue_history"][-1][3]
-                dialogue_history = self.format_dialogue_history(observation["dialogue_history"][:-1])
+                dialogue_history = self.format_dialogue_history(observation["dialogue_history"], stop=-1)
 
             if is_spy:
                 prompt = prompts.spyfall_answer_prompt_spy.format(
@@ -115,17 +131,14 @@ class DialogueAgent:
         return self.generator.generate(prompt_format.format(prompt=prompt, message_meta=message_meta))        
 
 
-from openai import OpenAI
-import os
-
-# load .env
-from dotenv import load_dotenv
-load_dotenv()
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-
 class OpenAIGenerator(GeneratorInterface):
-    def __init__(self, api_key):
-        self.client = OpenAI(api_key=api_key)
+    def __init__(self, api_key=None):
+        # imported here so DialogueAgent can be used without openai installed
+        from openai import OpenAI
+        from dotenv import load_dotenv
+
+        load_dotenv()
+        self.client = OpenAI(api_key=api_key or os.getenv("OPENAI_API_KEY"))
         self.set_generation_fn(self.generate_fn)
 
     def generate_fn(self, prompt):
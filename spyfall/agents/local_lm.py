@@ -0,0 +1,190 @@
+"""
+Deterministic local stand-in for the OpenAI backends.
+
+LocalLM plugs into dspy (dspy.settings.configure(lm=LocalLM())) and LocalGenerator
+into GeneratorInterface.set_generation_fn. Both produce well-formed outputs for
+every Spyfall signature without network access, with optional artificial latency,
+so full games can be benchmarked and load-tested offline.
+"""
+import random
+import re
+import time
+import zlib
+from typing import List
+
+from dsp.modules.lm import LM
+
+from spyfall.agents.dialogue import GeneratorInterface
+
+QUESTIONS = [
+    "What do you usually wear when you are here?",
+    "How often do you come to this place?",
+    "What is the first thing you do when you arrive?",
+    "Who else do you usually see around here?",
+    "What time of day is the busiest for you here?",
+    "What would you bring with you to this place?",
+]
+
+ANSWERS = [
+    "Something comfortable, it can get busy.",
+    "More often than I would like to admit.",
+    "I check in with the people I work with.",
+    "All kinds of people, it depends on the day.",
+    "Usually the afternoon, that is when most people show up.",
+    "Just the essentials, nothing fancy.",
+]
+
+ACCUSATIONS = [
+    "Their answers have been vague and avoid any specific details.",
+    "They keep asking questions that fish for the location.",
+    "Their answer did not fit with what everyone else described.",
+]
+
+REASONING = "produce the {field}. We look at how specific each player's answers were."
+
+PLAYER_PATTERN = re.compile(r"agent_\d+")
+PREFIX_PATTERN = re.compile(r"^([A-Z][\w ]*):", re.MULTILINE)
+
+
+class LocalLM(LM):
+    """
+    dspy language model that answers from templates. Outputs are a deterministic
+    function of the prompt and request kwargs (including temperature), so the
+    sample index still changes the output.
+    """
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, model: str = "local"):
+        super().__init__(model)
+        self.provider = "local"
+        self.latency = latency
+        self.jitter = jitter
+
+    def basic_request(self, prompt: str, **kwargs):
+        rng = random.Random(zlib.crc32(f"{prompt}{sorted(kwargs.items())}".encode()))
+        if self.latency or self.jitter:
+            time.sleep(max(0.0, self.latency + rng.uniform(-self.jitter, self.jitter)))
+        n = kwargs.get("n", 1)
+        completions = [complete_signature(prompt, rng) for _ in range(n)]
+        response = {"choices": [{"text": c} for c in completions]}
+        self.history.append({"prompt": prompt, "response": response, "kwargs": kwargs, "raw_kwargs": kwargs})
+        return response
+
+    def __call__(self, prompt: str, only_completed: bool = True, return_sorted: bool = False, **kwargs) -> List[str]:
+        kwargs = {**self.kwargs, **kwargs}
+        response = self.basic_request(prompt, **kwargs)
+        return [choice["text"] for choice in response["choices"]]
+
+
+def _query_section(prompt: str) -> str:
+    # dspy separates instructions, format, demos and the query with ---
+    return prompt.rsplit("---", 1)[-1]
+
+
+def _field(section: str, prefix: str) -> str:
+    """
+    Text of an input field in the query section, up to the next field prefix.
+    """
+    start = section.rfind(f"{prefix}:")
+    if start < 0:
+        return ""
+    text = section[start + len(prefix) + 1:]
+    next_field = PREFIX_PATTERN.search(text, 1)
+    return text[:next_field.start()] if next_field else text
+
+
+def _players(section: str) -> List[str]:
+    players = sorted(set(PLAYER_PATTERN.findall(section)), key=lambda p: int(p.split("_")[1]))
+    return players or [f"agent_{i}" for i in range(4)]
+
+
+def _locations(text: str) -> List[str]:
+    return [line.strip() for line in re.split(r"[\n,]", text) if line.strip()]
+
+
+def respond(prefix: str, section: str, rng: random.Random) -> str:
+    """
+    Output for a single output field, identified by its prefix.
+    """
+    prefix = prefix.lower()
+    if prefix == "question":
+        return rng.choice(QUESTIONS)
+    elif prefix == "answer":
+        return rng.choice(ANSWERS)
+    elif prefix == "accusation reasoning":
+        return rng.choice(ACCUSATIONS)
+    elif prefix == "vote":
+        return rng.choice(["Yes", "No"])
+    elif prefix == "guess":
+        locations = _locations(_field(section, "Locations"))
+        return rng.choice(locations) if locations else "Unknown"
+    elif prefix == "suspicion":
+        return "\n".join(f"{p}: {rng.random():.2f}" for p in _players(section))
+    elif prefix == "score":
+        return f"{rng.random():.2f}"
+    return "N/A"
+
+
+def complete_signature(prompt: str, rng: random.Random) -> str:
+    """
+    Completes a dspy prompt, which ends with the prefix of the first missing output field.
+    """
+    section = _query_section(prompt)
+    last_line = prompt.rstrip().rsplit("\n", 1)[-1]
+    if last_line.startswith("Reasoning:"):
+        # ChainOfThought, reasoning is followed by the remaining output fields of the format section
+        format_section = prompt.split("---")[1] if "---" in prompt else prompt
+        prefixes = PREFIX_PATTERN.findall(format_section)
+        following = prefixes[prefixes.index("Reasoning") + 1:] if "Reasoning" in prefixes else []
+        fields = [f"{p}: {respond(p, section, rng)}" for p in following]
+        field = following[0].lower() if following else "answer"
+        return " " + "\n\n".join([REASONING.format(field=field)] + fields)
+    prefix = last_line.split(":", 1)[0]
+    return " " + respond(prefix, section, rng)
+
+
+class LocalGenerator(GeneratorInterface):
+    """
+    Local generation function for DialogueAgent prompts (spyfall.agents.prompts).
+    """
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0):
+        super().__init__()
+        self.latency = latency
+        self.jitter = jitter
+        self.set_generation_fn(self.generate_fn)
+
+    def generate_fn(self, prompt: str) -> str:
+        rng = random.Random(zlib.crc32(prompt.encode()))
+        if self.latency or self.jitter:
+            time.sleep(max(0.0, self.latency + rng.uniform(-self.jitter, self.jitter)))
+        # prompts end with "You <action> <Player target>:"
+        last_line = prompt.rstrip().rsplit("\n", 1)[-1]
+        if " asked " in last_line:
+            return rng.choice(QUESTIONS)
+        elif " answered " in last_line:
+            return rng.choice(ANSWERS)
+        elif " vote " in last_line:
+            return rng.choice(["Yes", "No"])
+        elif " guessed " in last_line:
+            locations = prompt.rsplit("Locations:", 1)[-1].split("\n\n", 1)[0]
+            return rng.choice(_locations(locations) or ["Unknown"])
+        return rng.choice(ACCUSATIONS)
+
+
+if __name__ == "__main__":
+    import dspy
+    from spyfall.agents.signatures.vote import Vote
+    from spyfall.agents.signatures.suspicion import Suspicion
+
+    dspy.settings.configure(lm=LocalLM())
+    print(dspy.Predict(Vote)(
+        num_players="4",
+        current_player="agent_0",
+        location="Beach",
+        role="Lifeguard",
+        dialogue_history="<Player agent_1> asked <Player agent_0>: How often do you come here?.",
+        target="agent_1",
+    ))
+    print(dspy.ChainOfThought(Suspicion)(
+        dialogue_history="<Player agent_1> asked <Player agent_0>: How often do you come here?.",
+    ))
@@ -1,52 +1,102 @@
 import dspy
-import random
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
 from spyfall.agents.signatures.answer import NonSpyAnswer, SpyAnswer
 from spyfall.agents.signatures.question import NonSpyQuestion, SpyQuestion
 from spyfall.agents.signatures.guess import Guess
 from spyfall.agents.signatures.vote import Vote
 from spyfall.agents.signatures.accusation import SpyAccusation, NonSpyAccusation
-from spyfall.agents.signatures.judge import QuestionJudge, AnswerJudge, AccusationJudge, VoteJudge
+from spyfall.agents.signatures import configure_lm
+from spyfall.agents.cache import ResponseCache
+from spyfall.agents.context import ContextBuilder
+from spyfall.agents.parsing import parse_suspicion
 from spyfall.agents.signatures.suspicion import Suspicion
 
-print("Using Cache: ", dspy.dsp.modules.cache_turn_on)
+# temperature offset per sample index, keeps dspy's cache keys distinct for
+# repeated requests without making them unique on every run
+SAMPLE_TEMPERATURE_STEP = 1e-6
+
+def predict(signature, cache: ResponseCache, predictor=dspy.Predict, temperature=0.5, lm=None, **inputs) -> dspy.Prediction:
+    """
+    Runs a dspy predictor through the response cache, using lm instead of the configured LM if given.
+    Diversity between repeated identical requests comes from the sample index.
+    """
+    sample_index = cache.next_sample_index(signature.__name__, inputs)
+    key = cache.key(signature.__name__, inputs, sample_index)
+    outputs = cache.get(key)
+    if outputs is not None:
+        return dspy.Prediction(**outputs)
+
+    config = dict(
+        temperature=temperature + SAMPLE_TEMPERATURE_STEP * sample_index
+    )
+    if lm is not None:
+        with dspy.settings.context(lm=lm):
+            prediction = predictor(signature, **config)(**inputs)
+    else:
+        prediction = predictor(signature, **config)(**inputs)
+    cache.put(key, {k: prediction[k] for k in prediction.keys()})
+    return prediction
 
 class DialogueModule(dspy.Module):
-    def __init__(self, spy_idx, locations):
+    def __init__(
+            self,
+            spy_idx,
+            locations,
+            cache: ResponseCache = None,
+            context: ContextBuilder = None,
+            max_workers: int = 8
+        ):
+        """
+        context: fits the dialogue history into a token budget, otherwise the last
+            dialogue_memory turns are sent
+        max_workers: threads of the pool forward_many runs requests on
+        """
         self.spy_idx = spy_idx
         self.locations = locations
         self.dialogue_memory = 50
+        self.cache = cache if cache is not None else ResponseCache(mode="off")
+        self.context = context
+        self.max_workers = max_workers
+        # created on the first forward_many and reused for every vote round
+        self._executor = None
 
     def set_spy_idx(self, spy_idx):
         self.spy_idx = spy_idx
 
+    def _predict(self, signature, **inputs) -> dspy.Prediction:
+        if self.context is not None:
+            inputs["dialogue_history"] = self.context.fit(signature, inputs)
+        else:
+            inputs["dialogue_history"] = self.format_dialogue_history(inputs["dialogue_history"])
+        return predict(signature, self.cache, **inputs)
+
     def format_dialogue_history(self, dialogue_history):
-        # action_str = {0: "asked", 1: "answered", 2: "accused", 3: "voted for", 4: "guessed"}
-        string = ""
-        for dialogue in dialogue_history[-self.dialogue_memory:]:
-            # curr_player_idx = dialogue[0].replace("agent_", "")
-            string += f"{dialogue[3]}\n"
-        return string
+        if hasattr(dialogue_history, "render"):
+            # TurnLog keeps a rolling window of the last dialogue_memory turns
+            return dialogue_history.render(self.dialogue_memory)
+        return "".join(f"{dialogue[3]}\n" for dialogue in dialogue_history[-self.dialogue_memory:])
 
     def forward(self, observation, action) -> dspy.Prediction:
+        configure_lm()
         current_action, target = action
         is_spy = observation["current_player"] == self.spy_idx
-        dialogue_history = self.format_dialogue_history(observation["dialogue_history"])
+        # formatted per signature in _predict
+        dialogue_history = observation["dialogue_history"]
         observation["current_player"] = str(observation["current_player"])
         target = str(target)
-        config = dict(
-            temperature=0.5 + 0.0001 * random.uniform(-1, 1)
-        )
 
         if current_action == 0:  # Generate question to target
             if is_spy:
-                message = dspy.Predict(SpyQuestion, **config)(
+                message = self._predict(SpyQuestion,
                     num_players=str(observation["num_players"]),
                     current_player=observation["current_player"],
                     dialogue_history=dialogue_history,
                     target=target, 
                 )
             else:
-                message = dspy.Predict(NonSpyQuestion, **config)(
+                message = self._predict(NonSpyQuestion,
                     num_players=str(observation["num_players"]),
                     current_player=observation["current_player"],
                     location=observation["location"],
@@ -58,14 +108,14 @@ class DialogueModule(dspy.Module):
         elif current_action == 1:  # Answer question
             question = observation["dialogue_history"][-1][3]
             if is_spy:
-                message = dspy.Predict(SpyAnswer, **config)(
+                message = self._predict(SpyAnswer,
                     num_players=str(observation["num_players"]),
                     current_player=observation["current_player"],
                     dialogue_history=dialogue_history,
                     question=question,
                     )
             else:
-                message = dspy.Predict(NonSpyAnswer, **config)(
+                message = self._predict(NonSpyAnswer,
                     num_players=str(observation["num_players"]),
                     current_player=observation["current_player"],
                     location=observation["location"],
@@ -75,14 +125,14 @@ class DialogueModule(dspy.Module):
                 )
         elif current_action == 2:  # Accuse
             if is_spy:
-                message = dspy.Predict(SpyAccusation, **config)(
+                message = self._predict(SpyAccusation,
                     num_players=str(observation["num_players"]),
                     current_player=observation["current_player"],
                     dialogue_history=dialogue_history,
                     target=target,
                 )
             else:
-                message = dspy.Predict(NonSpyAccusation, **config)(
+                message = self._predict(NonSpyAccusation,
                     num_players=str(observation["num_players"]),
                     current_player=observation["current_player"],
                     location=observation["location"],
@@ -92,7 +142,7 @@ class DialogueModule(dspy.Module):
                 )
 
         elif current_action == 3:  # Vote
-            message = dspy.Predict(Vote, **config)(
+            message = self._predict(Vote,
                 num_players=str(observation["num_players"]),
                 current_player=observation["current_player"],
                 location=observation["location"],
@@ -102,16 +152,44 @@ class DialogueModule(dspy.Module):
             )
 
         elif current_action == 4:  # Guess
-            message = dspy.Predict(Guess, **config)(
+            message = self._predict(Guess,
                 num_players=str(observation["num_players"]),
                 current_player=observation["current_player"],
                 dialogue_history=dialogue_history,
-                locations="\n".join([loc['title'] for loc in self.locations]),
+                # dspy collapses whitespace in input fields, so newline separated titles would run together
+                locations=", ".join(observation.get("location_shortlist") or [loc['title'] for loc in self.locations]),
             )
 
         return message
 
+    def suspicion(self, dialogue_history, num_players: int) -> Optional[np.ndarray]:
+        """
+        (num_players,) suspicion vector of the Suspicion signature, None if unparseable.
+        """
+        configure_lm()
+        prediction = self._predict(Suspicion, dialogue_history=dialogue_history)
+        return parse_suspicion(prediction.suspicion, num_players)
+
+    def _forward_with(self, lm, request: Tuple[dict, list]) -> dspy.Prediction:
+        with dspy.settings.context(lm=lm):
+            return self.forward(*request)
+
+    def forward_many(self, requests: List[Tuple[dict, list]]) -> List[dspy.Prediction]:
+        """
+        Runs independent (observation, action) requests concurrently.
+        Predictions are returned in request order.
+        """
+        if len(requests) == 0:
+            return []
+        # dspy settings are per thread, so the calling thread's LM is configured once and handed to the workers
+        lm = configure_lm()
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="dialogue")
+        return list(self._executor.map(lambda request: self._forward_with(lm, request), requests))
+
 if __name__ == "__main__":
+    print("Using Cache: ", dspy.dsp.modules.cache_turn_on)
+
     examples = [
         dspy.Example(
             observation={
@@ -129,71 +207,11 @@ if __name__ == "__main__":
         )
     ]
 
-    def judge_message(example, pred, trace=None):
-        config = dict(
-            temperature=0.5 + 0.0001 * random.uniform(-1, 1)
-        )
-        action, target = example.action
-        action_keys = ["question", "answer", "accuse", "vote", "guess"]
-        pred_message = getattr(pred, action_keys[action])
-        observation = example.observation
-        print(observation)
-
-        if action == 0: # Question  
-            score = dspy.Predict(QuestionJudge, **config)(
-                location=observation["location"],
-                question=pred_message,
-            )
-        elif action == 1: # Answer
-            score = dspy.Predict(AnswerJudge, **config)(
-                location=observation["location"],
-                question=observation["dialogue_history"][-1][3],
-                answer=pred_message,
-            )
-        elif action == 2: # Accuse
-            score = dspy.Predict(AccusationJudge, **config)(
-                location=observation["location"],
-                dialogue_history=observation["dialogue_history"],
-                accusing_player=observation["current_player"],
-                accused_player=target,
-            )
-        elif action == 3: # Vote
-            score = dspy.Predict(VoteJudge, **config)(
-                location=observation["location"],
-                dialogue_history=observation["dialogue_history"],
-                voting_player=observation["current_player"],
-                voted_player=target,
-            )
-        elif action == 4: # Guess
-            if example.guess == pred.guess:
-                return 1.0
-            else:
-                return 0.0
-
-        suspicion = dspy.ChainOfThought(Suspicion, **config)(
-            dialogue_history="\n".join(observation["dialogue_history"]),
-        )
-
-        suspicion_scores = {}
-        for player_score in suspicion.suspicion.replace("\\n", "\n").split("\n"):
-            player, player_score = player_score.split(": ")
-            player = player.strip("<").strip(">")
-            suspicion_scores[player] = float(player_score)
-
-        # parse float from string, remove all non-numeric characters except for the decimal point
-        def parse_float(text: str) -> float:
-            return float(''.join(c for c in text if c.isdigit() or c == '.'))
-
-        suspicion_weight = 0.25
-
-        score = (parse_float(score.score) + (suspicion_scores[f"agent_{observation['current_player']}"] * suspicion_weight)) / (1 + suspicion_weight)
-        return score
-    
     dialogue_module = DialogueModule(spy_idx=0, locations=[])
     result = dialogue_module.forward(examples[0].observation, examples[0].action)
     print(result)
 
-    score = judge_message(examples[0], result)
-    print(score)
+    from spyfall.agents.modules.judge import judge_batch
+    print(judge_batch([(examples[0], result)]))
     
     
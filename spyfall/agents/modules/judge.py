@@ -0,0 +1,144 @@
+"""
+Judge metric for dialogue predictions, usable as a dspy optimization metric.
+
+A message is scored by its action's *Judge signature, mixed with the Suspicion
+the judge LM has of the speaking player given the dialogue history.
+"""
+import dspy
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Tuple
+from spyfall.agents.cache import ResponseCache
+from spyfall.agents.modules.dialogue import predict
+from spyfall.agents.parsing import PARSE_STATS, parse_score, parse_suspicion
+from spyfall.agents.signatures.judge import QuestionJudge, AnswerJudge, AccusationJudge, VoteJudge, ScoreReformat, judge_lm
+from spyfall.agents.signatures.suspicion import Suspicion, SuspicionReformat
+
+ACTION_KEYS = ["question", "answer", "accuse", "vote", "guess"]
+SUSPICION_WEIGHT = 0.25
+# used when the judge output can't be parsed even after the re-ask, a NaN would poison metric averages
+FALLBACK_SCORE = 0.0
+
+
+def history_text(dialogue_history) -> str:
+    if hasattr(dialogue_history, "render"):
+        return dialogue_history.render()
+    return "\n".join(dialogue_history)
+
+
+def judge_score(example, pred, cache: ResponseCache) -> float:
+    """
+    Score of the *Judge signature for the predicted message, guesses are scored by exact match.
+    FALLBACK_SCORE if the score can't be parsed.
+    """
+    action, target = example.action
+    pred_message = getattr(pred, ACTION_KEYS[action])
+    observation = example.observation
+
+    if action == 0: # Question
+        score = predict(QuestionJudge, cache, lm=judge_lm(),
+            location=observation["location"],
+            question=pred_message,
+        )
+    elif action == 1: # Answer
+        score = predict(AnswerJudge, cache, lm=judge_lm(),
+            location=observation["location"],
+            question=observation["dialogue_history"][-1][3],
+            answer=pred_message,
+        )
+    elif action == 2: # Accuse
+        score = predict(AccusationJudge, cache, lm=judge_lm(),
+            location=observation["location"],
+            dialogue_history=history_text(observation["dialogue_history"]),
+            accusing_player=str(observation["current_player"]),
+            accused_player=str(target),
+        )
+    elif action == 3: # Vote
+        score = predict(VoteJudge, cache, lm=judge_lm(),
+            location=observation["location"],
+            dialogue_history=history_text(observation["dialogue_history"]),
+            voting_player=str(observation["current_player"]),
+            voted_player=str(target),
+        )
+    elif action == 4: # Guess
+        return 1.0 if example.guess == pred.guess else 0.0
+
+    value = parse_score(score.score)
+    if value is None:
+        # one cheap re-ask to fix the format instead of judging again
+        value = parse_score(predict(ScoreReformat, cache, lm=judge_lm(), score_text=score.score).score)
+    if value is None:
+        PARSE_STATS.record_fallback("score")
+        return FALLBACK_SCORE
+    return value
+
+
+def suspicion_vector(dialogue: str, num_players: int, cache: ResponseCache) -> np.ndarray:
+    """
+    (num_players,) suspicion of the judge LM for a rendered dialogue history.
+    Agents whose suspicion can't be parsed get the uniform 1 / num_players.
+    """
+    suspicion = predict(Suspicion, cache, predictor=dspy.ChainOfThought, lm=judge_lm(),
+        dialogue_history=dialogue,
+    )
+    vector = parse_suspicion(suspicion.suspicion, num_players)
+    if vector is None or np.isnan(vector).any():
+        reformatted = predict(SuspicionReformat, cache, lm=judge_lm(),
+            agents=", ".join(f"agent_{i}" for i in range(num_players)),
+            suspicion_text=suspicion.suspicion,
+        )
+        retry = parse_suspicion(reformatted.suspicion, num_players)
+        if retry is not None:
+            vector = retry if vector is None else np.where(np.isnan(vector), retry, vector)
+    if vector is None:
+        vector = np.full(num_players, np.nan)
+    if np.isnan(vector).any():
+        PARSE_STATS.record_fallback("suspicion")
+        vector = np.where(np.isnan(vector), 1 / num_players, vector)
+    return vector
+
+
+def combine(score: float, suspicion: float) -> float:
+    return (score + suspicion * SUSPICION_WEIGHT) / (1 + SUSPICION_WEIGHT)
+
+
+def judge_message(example, pred, trace=None, cache: ResponseCache = None) -> float:
+    cache = cache if cache is not None else ResponseCache(mode="off")
+    score = judge_score(example, pred, cache)
+    if example.action[0] == 4:
+        return score
+    observation = example.observation
+    suspicion = suspicion_vector(history_text(observation["dialogue_history"]), observation["num_players"], cache)
+    return combine(score, suspicion[int(observation["current_player"])])
+
+
+def judge_batch(
+        pairs: List[Tuple[dspy.Example, dspy.Prediction]],
+        max_workers: int = 8,
+        cache: ResponseCache = None
+    ) -> np.ndarray:
+    """
+    judge_message for a list of (example, prediction) pairs, with all judge and
+    suspicion requests in flight on a pool of max_workers threads. Examples sharing
+    a dialogue history share one suspicion request. Returns the scores in pair order.
+    """
+    cache = cache if cache is not None else ResponseCache(mode="off")
+    dialogues = [
+        None if example.action[0] == 4
+        else (history_text(example.observation["dialogue_history"]), example.observation["num_players"])
+        for example, _ in pairs
+    ]
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        score_futures = [pool.submit(judge_score, example, pred, cache) for example, pred in pairs]
+        suspicion_futures = {
+            dialogue: pool.submit(suspicion_vector, *dialogue, cache)
+            for dialogue in dict.fromkeys(dialogues) if dialogue is not None
+        }
+        scores = np.array([future.result() for future in score_futures], dtype=np.float64)
+
+    for i, ((example, _), dialogue) in enumerate(zip(pairs, dialogues)):
+        if dialogue is not None:
+            suspicion = suspicion_futures[dialogue].result()
+            scores[i] = combine(scores[i], suspicion[int(example.observation["current_player"])])
+    return scores
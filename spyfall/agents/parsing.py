@@ -0,0 +1,114 @@
+"""
+Parsers for the free-text Suspicion and *Judge outputs.
+
+Parsers never raise on malformed LM output, they return None (or NaN entries) and
+count the failure in PARSE_STATS, so the caller can decide to re-ask. Callers that
+give up and use a default value count it with PARSE_STATS.record_fallback.
+"""
+import re
+import threading
+from collections import Counter
+from typing import Optional
+
+import numpy as np
+
+# "<agent_1>: 0.3", "agent_1 - 0.3", "Player 1: .3", "**agent_1**: 0.3"
+SUSPICION_PATTERN = re.compile(
+    r"(?:agent_|player\s*)(\d+)\W*?[:=\-]\s*(\d*\.?\d+)",
+    re.IGNORECASE,
+)
+# "score": 0.7 in JSON output, otherwise the first number
+SCORE_KEY_PATTERN = re.compile(r"score\W*?[:=]\s*(-?\d*\.?\d+)", re.IGNORECASE)
+NUMBER_PATTERN = re.compile(r"-?\d*\.?\d+")
+# an explicit score out of ten, "7/10" or "7 / 10"
+OUT_OF_TEN_PATTERN = re.compile(r"(\d*\.?\d+)\s*/\s*10(?![\d.])")
+
+
+class ParseStats:
+    """
+    Attempts, partial parses, failures and fallback values per output kind.
+    """
+
+    def __init__(self):
+        self.attempts = Counter()
+        self.partial = Counter()
+        self.failures = Counter()
+        self.fallbacks = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, kind: str, failed: bool, partial: bool = False):
+        with self._lock:
+            self.attempts[kind] += 1
+            self.failures[kind] += failed
+            self.partial[kind] += partial
+
+    def record_fallback(self, kind: str):
+        with self._lock:
+            self.fallbacks[kind] += 1
+
+    def failure_rate(self, kind: str) -> float:
+        return self.failures[kind] / max(self.attempts[kind], 1)
+
+    def summary(self) -> dict:
+        return {kind: {
+            "attempts": self.attempts[kind],
+            "partial": self.partial[kind],
+            "failures": self.failures[kind],
+            "fallbacks": self.fallbacks[kind],
+            "failure_rate": self.failure_rate(kind),
+        } for kind in self.attempts}
+
+
+PARSE_STATS = ParseStats()
+
+
+def parse_suspicion(text: str, num_players: int, stats: ParseStats = PARSE_STATS) -> Optional[np.ndarray]:
+    """
+    Suspicion of each agent as a (num_players,) float vector, indexed by agent number.
+    Values are clipped to [0, 1], agents missing from the text are NaN.
+    Returns None if no agent could be parsed.
+    """
+    vector = np.full(num_players, np.nan)
+    for agent, value in SUSPICION_PATTERN.findall(text.replace("\\n", "\n")):
+        agent = int(agent)
+        if agent < num_players:
+            vector[agent] = min(max(float(value), 0.0), 1.0)
+    missing = int(np.isnan(vector).sum())
+    failed = missing == num_players
+    stats.record("suspicion", failed, partial=0 < missing < num_players)
+    return None if failed else vector
+
+
+def parse_score(text: str, stats: ParseStats = PARSE_STATS) -> Optional[float]:
+    """
+    Judge score in [0, 1], explicit scores out of ten like "7/10" are rescaled.
+    None if the text contains no number or the score is out of range.
+    """
+    out_of_ten = OUT_OF_TEN_PATTERN.search(text)
+    if out_of_ten is not None:
+        value = float(out_of_ten.group(1)) / 10
+    else:
+        match = SCORE_KEY_PATTERN.search(text) or NUMBER_PATTERN.search(text)
+        value = None if match is None else float(match.group(match.lastindex or 0))
+    if value is not None and not 0.0 <= value <= 1.0:
+        value = None
+    stats.record("score", value is None)
+    return value
+
+
+if __name__ == "__main__":
+    import timeit
+
+    outputs = [
+        "<agent_0>: 0.2\n<agent_1>: 0.9\n<agent_2>: 0.1\n<agent_3>: 0.4",
+        "agent_0: 0.2\\nagent_1: 0.9\\nagent_2: 0.1\\nagent_3: 0.4",
+        "Player 0 - .2, Player 1 - .9",
+        "I can't tell who the spy is.",
+    ]
+    for output in outputs:
+        print(repr(output), "->", parse_suspicion(output, 4))
+    for output in ['{"score": 0.75}', "Score: 0.6/1.0", "8", "7/10", "85", "no idea"]:
+        print(repr(output), "->", parse_score(output))
+    print(PARSE_STATS.summary())
+    seconds = timeit.timeit(lambda: parse_suspicion(outputs[0], 4), number=10000) / 10000
+    print(f"parse_suspicion: {seconds * 1e6:.2f}us")
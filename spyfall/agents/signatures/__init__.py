@@ -2,11 +2,30 @@ import os
 from dotenv import load_dotenv
 import dspy
 
-load_dotenv()
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+def __getattr__(name):
+    # OPENAI_API_KEY is read from .env on first access instead of on import
+    if name == "OPENAI_API_KEY":
+        load_dotenv()
+        return os.getenv("OPENAI_API_KEY")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-turbo = dspy.OpenAI(model='gpt-3.5-turbo-instruct', max_tokens=250, api_key=OPENAI_API_KEY)
-dspy.settings.configure(lm=turbo)
+def make_lm(model: str):
+    """
+    Returns the LM for the given OpenAI model, or the offline LocalLM when SPYFALL_LM=local.
+    """
+    if os.getenv("SPYFALL_LM") == "local":
+        from spyfall.agents.local_lm import LocalLM
+        return LocalLM(latency=float(os.getenv("SPYFALL_LM_LATENCY", 0.0)))
+    load_dotenv()
+    return dspy.OpenAI(model=model, max_tokens=250, api_key=os.getenv("OPENAI_API_KEY"))
+
+def configure_lm():
+    """
+    Configures the default dspy LM on first use, unless one was configured already.
+    """
+    if dspy.settings.lm is None:
+        dspy.settings.configure(lm=make_lm('gpt-3.5-turbo-instruct'))
+    return dspy.settings.lm
 
 def docstring_parameter(*sub):
     def dec(obj):
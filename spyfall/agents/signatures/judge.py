@@ -1,10 +1,16 @@
 import dspy
+from functools import lru_cache
 from spyfall.agents import prompts
-from spyfall.agents.signatures import docstring_parameter
+from spyfall.agents.signatures import docstring_parameter, make_lm
 from pydantic import BaseModel, Field
 
-gpt4 = dspy.OpenAI(model='gpt-4-turbo-preview', max_tokens=250)
-dspy.settings.configure(lm=gpt4)
+@lru_cache(maxsize=None)
+def judge_lm():
+    """
+    LM used by the judge signatures, created on first use.
+    Use with dspy.settings.context(lm=judge_lm()).
+    """
+    return make_lm('gpt-4-turbo-preview')
 
 def make_judge_output(response_type: str):
     class JudgeOutput(BaseModel):
@@ -130,7 +136,21 @@ class VoteJudge(dspy.Signature):
     score: make_judge_output("vote") = dspy.OutputField()
 
 
+class ScoreReformat(dspy.Signature):
+    """
+    Rewrite the score given by a Spyfall judge as a single floating-point number between 0.0 and 1.0. Do not reassess the score.
+    """
+
+    score_text = dspy.InputField(
+        desc="The malformed score output.",
+    )
+    score = dspy.OutputField(
+        desc="The score as a number, e.g. 0.5",
+    )
+
+
 if __name__ == "__main__":
+    dspy.settings.configure(lm=judge_lm())
     answer_judge = dspy.ChainOfThought(AnswerJudge)
 
     result = answer_judge(
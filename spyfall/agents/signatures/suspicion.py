@@ -17,6 +17,23 @@ class Suspicion(dspy.Signature):
     )
 
 
+class SuspicionReformat(dspy.Signature):
+    """
+    Rewrite the suspicion scores of a Spyfall judge in the required output format, one line per agent.
+    Use a float between 0 and 1 for each agent. Do not reassess the scores.
+    """
+
+    agents = dspy.InputField(
+        desc="The agents to output a suspicion for.",
+    )
+    suspicion_text = dspy.InputField(
+        desc="The malformed suspicion output.",
+    )
+    suspicion = dspy.OutputField(
+        desc="Output format: <agent_name>: <suspicion>\\n<agent_name>: <suspicion>",
+    )
+
+
 if __name__ == "__main__":
     suspicion = dspy.Predict(Suspicion)
 
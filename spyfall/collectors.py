@@ -0,0 +1,103 @@
+"""
+Multi-process rollout collection for Spyfall.
+
+Nearly all rollout time is spent waiting on the LM inside handle_action, so
+rollouts are spread over worker processes. Each worker builds its own
+SpyfallEnv and dialogue backend. Workers are spawned, so each one loads the
+location catalog itself; the policy weights are shared with them by the collector.
+"""
+import time
+from functools import partial
+from typing import Callable, Iterator, Sequence, Tuple, Union
+
+import torch
+from tensordict import TensorDictBase
+from tensordict.nn import TensorDictModule
+try:
+    from torchrl.collectors import MultiaSyncDataCollector, MultiSyncDataCollector, SyncDataCollector
+except ImportError:  # torchrl >= 0.11
+    from torchrl.collectors import (
+        Collector as SyncDataCollector,
+        MultiAsyncCollector as MultiaSyncDataCollector,
+        MultiSyncCollector as MultiSyncDataCollector,
+    )
+from torchrl.data.replay_buffers import ReplayBuffer
+
+from spyfall.environment.spyfall_env import init_env
+from spyfall.environment.torchrl_env import SpyfallTorchRLEnv
+
+
+def make_env_fn(num_players: int, observation_dim: int, device: torch.device, **env_kwargs) -> Callable:
+    """
+    Picklable constructor of a wrapped SpyfallEnv for collector workers.
+    """
+    return partial(init_env, num_players=num_players, observation_dim=observation_dim, device=device, **env_kwargs)
+
+
+def make_batched_env_fn(num_games: int, num_players: int, observation_dim: int, device: torch.device, **env_kwargs) -> Callable:
+    """
+    Picklable constructor of a rules-only SpyfallTorchRLEnv running num_games games, for collector workers.
+    """
+    return partial(
+        SpyfallTorchRLEnv, num_games=num_games, num_players=num_players,
+        observation_dim=observation_dim, device=device, **env_kwargs
+    )
+
+
+def make_collector(
+        policy: TensorDictModule,
+        num_workers: int,
+        num_players: int,
+        observation_dim: int,
+        frames_per_batch: int,
+        total_frames: int,
+        device: torch.device,
+        sync: bool = False,
+        background: bool = False,
+        env_fn: Union[Callable, Sequence[Callable]] = None,
+        **env_kwargs
+    ):
+    """
+    Returns a SyncDataCollector for a single worker, otherwise a multi-process collector.
+    With sync=False batches are yielded as soon as any worker finishes one, so slow
+    LM calls in one worker don't hold back the others.
+    background: run a single worker in its own process too, so collection overlaps
+        with whatever the caller does between batches
+    env_fn: env constructor for the workers or one per worker, defaults to make_env_fn with env_kwargs
+    """
+    if env_fn is None:
+        env_fn = make_env_fn(num_players, observation_dim, device, **env_kwargs)
+    env_fns = list(env_fn) if isinstance(env_fn, Sequence) else [env_fn] * num_workers
+
+    if num_workers == 1 and not background:
+        return SyncDataCollector(
+            env_fns[0](),
+            policy,
+            device=device,
+            frames_per_batch=frames_per_batch,
+            total_frames=total_frames,
+        )
+
+    collector_cls = MultiSyncDataCollector if sync else MultiaSyncDataCollector
+    return collector_cls(
+        env_fns,
+        policy,
+        device=device,
+        frames_per_batch=frames_per_batch,
+        total_frames=total_frames,
+    )
+
+
+def stream_rollouts(collector, replay_buffer: ReplayBuffer) -> Iterator[Tuple[TensorDictBase, dict]]:
+    """
+    Extends the replay buffer with each batch as soon as the collector yields it.
+    Yields the batch with throughput stats, so the caller can train or update
+    the collector's policy weights in between.
+    """
+    start = time.perf_counter()
+    frames = 0
+    for batch in collector:
+        replay_buffer.extend(batch.reshape(-1))
+        frames += batch.numel()
+        elapsed = time.perf_counter() - start
+        yield batch, {"frames": frames, "elapsed": elapsed, "frames_per_sec": frames / elapsed}
@@ -0,0 +1,299 @@
+"""
+Vectorized Spyfall environment that steps many games in lockstep.
+
+Game state for all games lives in NumPy arrays so masking, action decoding,
+vote tallying and reward assignment run once per batch instead of once per game.
+The rules mirror SpyfallEnv.step exactly; the only difference is that the
+outcome of votes and location guesses comes from vote_fn/guess_fn instead of
+an LLM, since there is no dialogue in batched mode.
+"""
+from typing import Callable, List, Optional, Union
+
+import numpy as np
+
+from spyfall.environment import masks
+from spyfall.environment.encoders import encode_moves
+from spyfall.environment.locations import LocationCatalog, load_catalog
+from spyfall.environment.masks import NUM_ACTION_TYPES
+
+ASK, ANSWER, ACCUSE, VOTE, GUESS = range(NUM_ACTION_TYPES)
+
+# outcome of a completed vote, see SpyfallEnv._tally_votes
+VOTE_PENDING, VOTE_CONTINUE, VOTE_SPY_WIN, VOTE_NON_SPY_WIN = range(4)
+
+
+class BatchedSpyfallEnv:
+    metadata = {
+        "name": "BatchedSpyfall",
+        "description": "Vectorized multi-agent social deduction game.",
+    }
+
+    def __init__(
+            self,
+            num_games: int,
+            num_players: int,
+            observation_dim: int,
+            locations: Union[LocationCatalog, List[dict]] = None,
+            vote_fn: Callable = None,
+            guess_fn: Callable = None,
+            vote_prob: float = 0.5,
+            guess_prob: float = None,
+            max_steps: int = 100,
+            decay: float = 0.9,
+            seed: int = None,
+        ):
+        """
+        vote_fn(games, voters, accused) -> bool array, True for a "Yes" vote
+        guess_fn(games, spies) -> bool array, True if the spy guessed the location
+        Without vote_fn/guess_fn, votes are "Yes" with probability vote_prob and
+        guesses are correct with probability guess_prob (1 / num locations by default).
+        Observations encode the move history like SpyfallEnv's symbolic mode, with move counts
+        discounted by decay.
+        """
+        locations = load_catalog() if locations is None else locations
+        self.num_games = num_games
+        self.num_players = num_players
+        self.observation_dim = observation_dim
+        self.locations = locations
+        self.max_steps = max_steps
+        self.decay = decay
+        self.vote_prob = vote_prob
+        self.guess_prob = 1 / len(locations) if guess_prob is None else guess_prob
+        self.vote_fn = vote_fn if vote_fn is not None else self._random_votes
+        self.guess_fn = guess_fn if guess_fn is not None else self._random_guesses
+        self.possible_agents = [f"agent_{i}" for i in range(num_players)]
+        self.agents = self.possible_agents
+        self._rng = np.random.default_rng(seed)
+
+        if isinstance(locations, LocationCatalog):
+            self.role_counts = locations.role_counts
+        else:
+            self.role_counts = np.array([len(loc["roles"]) for loc in locations], dtype=np.int64)
+        if self.role_counts.min() < num_players:
+            raise ValueError(f"Every location needs at least {num_players} roles.")
+
+        n, p = num_games, num_players
+        self.location = np.zeros(n, dtype=np.int64)
+        self.roles = np.zeros((n, p), dtype=np.int64)  # index into location roles, -1 for the spy
+        self.spy_idx = np.zeros(n, dtype=np.int64)
+        self.votes = np.full((n, p), -1, dtype=np.int8)  # -1 not voted, 0 "No", 1 "Yes"
+        self.accused_agent = np.full(n, -1, dtype=np.int64)
+        self.agent_selection = np.zeros(n, dtype=np.int64)  # -1 when no agent is selected
+        self.last_target = np.full(n, -1, dtype=np.int64)
+        self.timestep = np.zeros(n, dtype=np.int64)
+        self.done = np.zeros(n, dtype=bool)
+        self.action_masks = np.zeros((n, p, NUM_ACTION_TYPES, p), dtype=np.int8)
+        self.mask_table = masks.action_mask_table(num_players)
+        self.rewards = np.zeros((n, p), dtype=np.float32)
+        self.terminations = np.zeros((n, p), dtype=bool)
+        self.truncations = np.zeros((n, p), dtype=bool)
+        self.move_counts = np.zeros((n, NUM_ACTION_TYPES, p, p), dtype=np.float32)
+        self.last_move = np.full((n, 3), -1, dtype=np.int64)  # action type, agent, target
+
+        self._games = np.arange(n)
+        self._players = np.arange(p)
+
+    def _random_votes(self, games, voters, accused):
+        return self._rng.random(len(games)) < self.vote_prob
+
+    def _random_guesses(self, games, spies):
+        return self._rng.random(len(games)) < self.guess_prob
+
+    def _set_ask_masks(self, games):
+        # every agent may ask any other agent
+        self.action_masks[games] = self.mask_table[masks.ASK]
+
+    def _set_all_masks(self, games, phase, agents):
+        # every agent gets the same mask
+        self.action_masks[games] = self.mask_table[phase, agents][:, None]
+
+    def _assign_roles(self, games):
+        n = len(games)
+        counts = self.role_counts[self.location[games]]
+        # random permutation of each location's roles, padded roles sort last
+        keys = self._rng.random((n, self.role_counts.max()))
+        keys[np.arange(keys.shape[1]) >= counts[:, None]] = np.inf
+        self.roles[games] = np.argsort(keys, axis=1)[:, :self.num_players]
+        self.spy_idx[games] = self._rng.integers(0, self.num_players, size=n)
+        self.roles[games, self.spy_idx[games]] = -1
+
+    def reset(self, games: Optional[np.ndarray] = None, seed: int = None):
+        """
+        Resets the given games (all by default). Returns observations and infos.
+        """
+        if seed is not None:
+            self._rng = np.random.default_rng(seed)
+        games = self._games if games is None else np.asarray(games)
+        if games.dtype == bool:
+            games = np.flatnonzero(games)
+
+        self.location[games] = self._rng.integers(0, len(self.locations), size=len(games))
+        self._assign_roles(games)
+        self.votes[games] = -1
+        self.accused_agent[games] = -1
+        self.agent_selection[games] = 0
+        self.last_target[games] = -1
+        self.timestep[games] = 0
+        self.done[games] = False
+        self.rewards[games] = 0
+        self.terminations[games] = False
+        self.truncations[games] = False
+        self.move_counts[games] = 0
+        self.last_move[games] = -1
+        self._set_ask_masks(games)
+
+        return self.observe(), {"action_mask": self.action_masks}
+
+    def observe(self):
+        is_spy = self._players == self.spy_idx[:, None]
+        return encode_moves(self.move_counts, self.last_move, is_spy, self.observation_dim)
+
+    def _get_current_action(self, games, action: np.ndarray):
+        """
+        action is either an integer array of shape (num_games,) of flat actions
+        action_type * num_players + target, or an array of shape (num_games, 5, num_players)
+        whose masked argmax is the current action, for the selected agent of each game.
+        """
+        mask = self.action_masks[games, self.agent_selection[games]].reshape(len(games), -1)
+        if action.ndim == 1:
+            flat = action[games]
+            if not mask[np.arange(len(games)), flat].all():
+                raise ValueError("Actions must be legal for the selected agent of each game")
+        else:
+            flat = np.where(mask == 1, action[games].reshape(len(games), -1), -np.inf).argmax(axis=1)
+        return np.divmod(flat, self.num_players)
+
+    def _resample_targets(self, current, last_target):
+        # uniform choice over agents other than last_target and current
+        lo = np.minimum(current, last_target)
+        hi = np.maximum(current, last_target)
+        target = self._rng.integers(0, self.num_players - 2, size=len(current))
+        target += target >= lo
+        target += target >= hi
+        return target
+
+    def _tally_votes(self, games):
+        votes = self.votes[games]
+        result = np.full(len(games), VOTE_PENDING, dtype=np.int64)
+        complete = (votes >= 0).all(axis=1)
+        # Exclude the spy's vote from the tally
+        is_spy = self._players == self.spy_idx[games, None]
+        unanimous = ((votes == 1) | is_spy).all(axis=1)
+        caught = self.accused_agent[games] == self.spy_idx[games]
+        result[complete & ~unanimous] = VOTE_CONTINUE
+        result[complete & unanimous & ~caught] = VOTE_SPY_WIN
+        result[complete & unanimous & caught] = VOTE_NON_SPY_WIN
+        return result
+
+    def _end_games(self, games, winners):
+        """
+        winners: agent index per game that receives +1, every other agent receives -1
+        """
+        self.rewards[games] = -1
+        self.rewards[games, winners] = 1
+        self.terminations[games] = True
+        self.truncations[games] = True
+
+    def step(self, action: np.ndarray):
+        """
+        action: (num_games,) flat actions or (num_games, 5, num_players) action values
+            for the selected agent of each game.
+        Finished games are skipped until they are reset.
+        """
+        self.rewards[:] = 0
+        self.terminations[:] = False
+        self.truncations[:] = False
+        games = self._games[~self.done]
+        self.timestep[games] += 1
+
+        current = self.agent_selection[games]
+        action_type, target = self._get_current_action(games, np.asarray(action))
+
+        # check to see if target_agent was target of last dialogue
+        repeat = (action_type == ASK) & (target == self.last_target[games])
+        if repeat.any():
+            target[repeat] = self._resample_targets(current[repeat], self.last_target[games[repeat]])
+        self.last_target[games] = target
+        self.move_counts[games] *= self.decay
+        self.move_counts[games, action_type, current, target] += 1
+        self.last_move[games] = np.stack([action_type, current, target], axis=1)
+
+        # Question asked: target answers to current agent
+        sel = action_type == ASK
+        g, c, t = games[sel], current[sel], target[sel]
+        self.agent_selection[g] = t
+        self.action_masks[g, t] = self.mask_table[masks.ANSWER, c]
+
+        # Question answered: current agent asks next, the spy may also guess
+        sel = action_type == ANSWER
+        g, c = games[sel], current[sel]
+        phase = np.where(c == self.spy_idx[g], masks.SPY_TURN, masks.TURN)
+        self.action_masks[g, c] = self.mask_table[phase, c]
+
+        # Accusation made: everyone votes on the accused agent
+        sel = action_type == ACCUSE
+        g, t = games[sel], target[sel]
+        self.accused_agent[g] = t
+        self.votes[g] = -1
+        self._set_all_masks(g, masks.VOTE, t)
+
+        # Vote: next agent is the first one that has not voted
+        sel = action_type == VOTE
+        vote_games, c = games[sel], current[sel]
+        self.votes[vote_games, c] = self.vote_fn(vote_games, c, self.accused_agent[vote_games])
+        not_voted = self.votes[vote_games] < 0
+        self.agent_selection[vote_games] = np.where(not_voted.any(axis=1), not_voted.argmax(axis=1), -1)
+        self._set_all_masks(vote_games, masks.VOTE, self.accused_agent[vote_games])
+
+        # Spy guesses location
+        sel = action_type == GUESS
+        g, c = games[sel], current[sel]
+        correct = self.guess_fn(g, c)
+        self._set_all_masks(g, masks.GUESS, c)
+        # correct guess: spy +1, others -1; wrong guess: spy -1, others +1
+        sign = np.where(correct, 1, -1).astype(np.float32)
+        self.rewards[g] = -sign[:, None]
+        self.rewards[g, c] = sign
+        self.terminations[g] = True
+        self.truncations[g] = True
+
+        result = self._tally_votes(vote_games)
+
+        # a non-spy was voted out, spy wins
+        g = vote_games[result == VOTE_SPY_WIN]
+        self._end_games(g, self.spy_idx[g])
+
+        # spy was voted out, spy gets a chance to guess location
+        g = vote_games[result == VOTE_NON_SPY_WIN]
+        spies = self.spy_idx[g]
+        self.action_masks[g, spies] = self.mask_table[masks.GUESS, spies]
+        self.agent_selection[g] = spies
+
+        # not unanimous, accused agent asks next
+        g = vote_games[result == VOTE_CONTINUE]
+        self.votes[g] = -1
+        self.agent_selection[g] = self.accused_agent[g]
+        self.accused_agent[g] = -1
+        self._set_ask_masks(g)
+
+        g = games[self.timestep[games] > self.max_steps]
+        self.terminations[g] = True
+        self.truncations[g] = True
+
+        self.done |= self.terminations.all(axis=1)
+
+        return self.observe(), self.rewards, self.terminations, self.truncations, {"action_mask": self.action_masks}
+
+
+if __name__ == "__main__":
+    import time
+
+    env = BatchedSpyfallEnv(num_games=4096, num_players=4, observation_dim=16, seed=0)
+    env.reset()
+    start = time.perf_counter()
+    steps = 0
+    while not env.done.all():
+        steps += int((~env.done).sum())
+        env.step(np.random.rand(env.num_games, NUM_ACTION_TYPES, env.num_players))
+    elapsed = time.perf_counter() - start
+    print(f"{steps} game steps in {elapsed:.3f}s ({steps / elapsed:.0f} steps/s)")
@@ -0,0 +1,187 @@
+"""
+Dialogue history encoders that turn the game's dialogue into per-agent observations.
+"""
+import re
+import zlib
+from abc import ABC, abstractmethod
+from typing import Dict, List, Tuple
+
+import numpy as np
+import torch
+
+
+class DialogueEncoder(ABC):
+    """
+    Interface for encoding the dialogue history into per-agent observations.
+
+    Each dialogue entry is embedded exactly once when it is added and cached by
+    (game_id, turn). Observations are updated incrementally with an exponential
+    moving average of turn embeddings, so an update costs the same at turn 100
+    as at turn 1. Each agent's observation also includes the embedding of its
+    private card (location and role, or spy).
+    """
+
+    def __init__(self, observation_dim: int, decay: float = 0.9):
+        self.observation_dim = observation_dim
+        self.decay = decay
+        self.game_id = None
+        self.agents = None
+        self._cache: Dict[Tuple[int, int], np.ndarray] = {}
+        self._history = np.zeros(observation_dim, dtype=np.float32)
+        self._cards = None
+        self._observations = None
+
+    @abstractmethod
+    def embed(self, text: str) -> np.ndarray:
+        """
+        Embeds a single dialogue entry into a (observation_dim,) float32 array.
+        """
+
+    @staticmethod
+    def card_text(role: str, location: str) -> str:
+        # the spy's card does not show the location
+        return "role: spy" if role == "spy" else f"location: {location} role: {role}"
+
+    def reset(self, game_id: int, agents: List[str], roles: Dict[str, str], location: str):
+        """
+        Starts encoding a new game. roles maps each agent to its role, "spy" for the spy.
+        """
+        self.game_id = game_id
+        self.agents = {a: i for i, a in enumerate(agents)}
+        self._cache.clear()
+        self._history[:] = 0
+        self._cards = np.stack([self.embed(self.card_text(roles[a], location)) for a in agents])
+        self._observations = self._cards.copy()
+
+    def update(self, game_id: int, turn: int, current_agent, action_type: int, target_agent, dialogue: str):
+        """
+        Adds a new dialogue entry to the running observations.
+        """
+        key = (game_id, turn)
+        if key in self._cache:
+            return
+        embedding = self.embed(dialogue)
+        self._cache[key] = embedding
+        self._history *= self.decay
+        self._history += (1 - self.decay) * embedding
+        np.add(self._cards, self._history, out=self._observations)
+
+    def embedding(self, game_id: int, turn: int) -> np.ndarray:
+        return self._cache[(game_id, turn)]
+
+    def observe(self, agent) -> torch.Tensor:
+        return torch.tensor(self._observations[self.agents[agent]])
+
+    def observations(self) -> np.ndarray:
+        """
+        (num_agents, observation_dim) float32 observations of all agents, in agent order.
+        """
+        return self._observations
+
+
+class HashedNgramEncoder(DialogueEncoder):
+    """
+    Offline default encoder. Hashes word unigrams and character trigrams into
+    observation_dim signed buckets and L2 normalizes the result.
+    """
+
+    def __init__(self, observation_dim: int, decay: float = 0.9, ngram: int = 3):
+        super().__init__(observation_dim, decay)
+        self.ngram = ngram
+        self._word_cache: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+
+    def _hash_word(self, word: str) -> Tuple[np.ndarray, np.ndarray]:
+        if word not in self._word_cache:
+            padded = f"#{word}#"
+            tokens = [word] + [padded[i:i + self.ngram] for i in range(max(len(padded) - self.ngram + 1, 1))]
+            hashes = np.array([zlib.crc32(t.encode()) for t in tokens], dtype=np.int64)
+            self._word_cache[word] = (
+                hashes % self.observation_dim,
+                np.where(hashes & (1 << 31), -1.0, 1.0).astype(np.float32),
+            )
+        return self._word_cache[word]
+
+    def embed(self, text: str) -> np.ndarray:
+        embedding = np.zeros(self.observation_dim, dtype=np.float32)
+        for word in re.findall(r"\w+", text.lower()):
+            idx, sign = self._hash_word(word)
+            np.add.at(embedding, idx, sign)
+        norm = np.linalg.norm(embedding)
+        if norm > 0:
+            embedding /= norm
+        return embedding
+
+
+def encode_moves(counts: np.ndarray, last_move: np.ndarray, is_spy: np.ndarray, observation_dim: int) -> np.ndarray:
+    """
+    Structured encoding of the move history, vectorized over any leading batch dims.
+    counts: (..., 5, P, P) decayed counts of (action type, agent, target) moves
+    last_move: (..., 3) int (action type, agent, target) of the last move, -1 before the first move
+    is_spy: (..., P) bool
+    returns (..., P, observation_dim) float32, per agent:
+        [is spy, own index one-hot, last move one-hots, move counts]
+    Features beyond observation_dim are folded back onto it by summation.
+    """
+    num_actions, num_players = counts.shape[-3], counts.shape[-1]
+    batch = counts.shape[:-3]
+    last = np.concatenate([
+        np.eye(num_actions + 1, dtype=np.float32)[last_move[..., 0]][..., :num_actions],
+        np.eye(num_players + 1, dtype=np.float32)[last_move[..., 1]][..., :num_players],
+        np.eye(num_players + 1, dtype=np.float32)[last_move[..., 2]][..., :num_players],
+        counts.reshape(*batch, -1).astype(np.float32),
+    ], axis=-1)
+    own = np.concatenate([
+        is_spy[..., None].astype(np.float32),
+        np.broadcast_to(np.eye(num_players, dtype=np.float32), (*batch, num_players, num_players)),
+    ], axis=-1)
+    features = np.concatenate([own, np.broadcast_to(last[..., None, :], (*batch, num_players, last.shape[-1]))], axis=-1)
+    pad = -features.shape[-1] % observation_dim
+    features = np.concatenate([features, np.zeros((*features.shape[:-1], pad), dtype=np.float32)], axis=-1)
+    return features.reshape(*features.shape[:-1], -1, observation_dim).sum(axis=-2)
+
+
+class SymbolicEncoder(DialogueEncoder):
+    """
+    Encodes the move history from (agent, action type, target) only and ignores the dialogue text.
+    Used by the no-dialogue symbolic mode.
+    """
+
+    def __init__(self, observation_dim: int, num_players: int, decay: float = 0.9, num_actions: int = 5):
+        super().__init__(observation_dim, decay)
+        self._counts = np.zeros((num_actions, num_players, num_players), dtype=np.float32)
+        self._last_move = np.full(3, -1, dtype=np.int64)
+        self._is_spy = np.zeros(num_players, dtype=bool)
+
+    def embed(self, text: str) -> np.ndarray:
+        # the text carries no information in symbolic mode
+        return np.zeros(self.observation_dim, dtype=np.float32)
+
+    def reset(self, game_id: int, agents: List[str], roles: Dict[str, str], location: str):
+        self.game_id = game_id
+        self.agents = {a: i for i, a in enumerate(agents)}
+        self._counts[:] = 0
+        self._last_move[:] = -1
+        self._is_spy[:] = [roles[a] == "spy" for a in agents]
+        self._observations = encode_moves(self._counts, self._last_move, self._is_spy, self.observation_dim)
+
+    def update(self, game_id: int, turn: int, current_agent, action_type: int, target_agent, dialogue: str):
+        move = (int(action_type), self.agents[current_agent], self.agents[target_agent])
+        self._counts *= self.decay
+        self._counts[move] += 1
+        self._last_move[:] = move
+        self._observations = encode_moves(self._counts, self._last_move, self._is_spy, self.observation_dim)
+
+
+if __name__ == "__main__":
+    import time
+
+    encoder = HashedNgramEncoder(observation_dim=128)
+    agents = [f"agent_{i}" for i in range(4)]
+    encoder.reset(0, agents, {a: "Lifeguard" for a in agents}, "Beach")
+    sentence = "<Player agent_1> asked <Player agent_2>: What do you do in your role in this location?."
+    for turn in range(1000):
+        start = time.perf_counter()
+        encoder.update(0, turn, "agent_1", 0, "agent_2", sentence)
+        obs = encoder.observe("agent_0")
+        if turn in (0, 99, 999):
+            print(f"turn {turn}: {(time.perf_counter() - start) * 1e6:.0f}us", obs.shape)
@@ -23,14 +23,13 @@ def simulate(env, auto=False):
             action_type = int(input("Select an action type: "))
             target_agent = int(input(f"Select a target agent (0 to {env.num_players - 1}): "))
 
-            action = np.full((5, env.num_players), -np.inf)
-            action[action_type, target_agent] = 1
+            action = action_type * env.num_players + target_agent
             print(f"Action: {action}")
 
             message = input("Enter your dialogue message: ")
         else:
-            # random action for now
-            action = torch.rand((5, env.num_players))
+            # random legal action for now
+            action = np.random.choice(np.flatnonzero(env.action_masks[current_agent]))
 
         env.set_player_message(message)
         observations, rewards, terminations, truncations, infos = env.step(action)
@@ -45,6 +44,6 @@ if __name__ == "__main__":
     observation_dim = 128
     device = torch.device('cpu')
 
-    env = init_env(num_players, observation_dim, device, wrapped=False)
+    env = init_env(num_players, observation_dim, device, wrapped=False, categorical_actions=True)
 
     simulate(env, auto=True)
\ No newline at end of file
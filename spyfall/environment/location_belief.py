@@ -0,0 +1,82 @@
+"""
+Spy's posterior over locations, from an inverted index over the location catalog.
+"""
+from functools import lru_cache
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from spyfall.environment.locations import words
+
+
+@lru_cache(maxsize=None)
+def location_index(titles: Tuple[str, ...], roles: Tuple[Tuple[str, ...], ...]) -> Dict[str, Tuple[np.ndarray, float]]:
+    """
+    Inverted index word -> (location ids, idf weight) over location titles and roles.
+    Words shared by many locations ("manager", "customer") get a low weight.
+    """
+    postings: Dict[str, set] = {}
+    for idx, (title, location_roles) in enumerate(zip(titles, roles)):
+        for word in words(" ".join([title, *location_roles])):
+            postings.setdefault(word, set()).add(idx)
+    num_locations = len(titles)
+    return {
+        word: (np.array(sorted(ids)), float(np.log(num_locations / len(ids))))
+        for word, ids in postings.items()
+    }
+
+
+class LocationBelief:
+    """
+    Log-posterior over locations, starting uniform. Each message adds the idf
+    weight of its indexed words to the locations they occur in.
+    """
+
+    def __init__(self, locations: Sequence[dict], weight: float = 1.0):
+        self.titles = tuple(loc["title"] for loc in locations)
+        self.index = location_index(self.titles, tuple(tuple(loc["roles"]) for loc in locations))
+        self.weight = weight
+        self.log_posterior = np.zeros(len(self.titles))
+
+    def reset(self):
+        self.log_posterior[:] = 0
+
+    def update(self, message: str):
+        for word in words(message):
+            posting = self.index.get(word)
+            if posting is not None:
+                ids, idf = posting
+                self.log_posterior[ids] += self.weight * idf
+
+    def posterior(self) -> np.ndarray:
+        posterior = np.exp(self.log_posterior - self.log_posterior.max())
+        return posterior / posterior.sum()
+
+    def top_k(self, k: int) -> List[str]:
+        """
+        The k most likely location titles, most likely first.
+        """
+        k = min(k, len(self.titles))
+        ids = np.argpartition(-self.log_posterior, k - 1)[:k]
+        ids = ids[np.argsort(-self.log_posterior[ids], kind="stable")]
+        return [self.titles[i] for i in ids]
+
+    def guess(self) -> str:
+        """
+        Non-LLM guess, the most likely location.
+        """
+        return self.titles[int(np.argmax(self.log_posterior))]
+
+
+if __name__ == "__main__":
+    from spyfall.environment.locations import load_catalog
+
+    belief = LocationBelief(load_catalog().to_dicts())
+    for message in [
+        "<Player agent_1> answered <Player agent_0>: The captain keeps us on schedule.",
+        "<Player agent_2> answered <Player agent_1>: I usually talk to the passengers first.",
+        "<Player agent_3> answered <Player agent_2>: The mechanic checks the engines before we leave.",
+    ]:
+        belief.update(message)
+        print(belief.top_k(3), f"{belief.posterior().max():.2f}")
+    print("guess:", belief.guess())
@@ -0,0 +1,89 @@
+"""
+Location catalog for Spyfall.
+
+The catalog is bundled with the package and parsed once per process. Collector
+workers forked after the first load share the parsed catalog read-only.
+"""
+import json
+import os
+import re
+from functools import lru_cache
+from typing import List, NamedTuple, Tuple
+
+import numpy as np
+
+CATALOG_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "locations.json")
+REMOTE_URL = "https://raw.githubusercontent.com/PepsRyuu/spyfall/master/locations.json"
+WORD_PATTERN = re.compile(r"[a-z]{3,}")
+
+
+def words(text: str) -> List[str]:
+    """
+    Lowercase words of at least 3 letters, with a plural s stripped, for matching messages to locations.
+    """
+    return [w[:-1] if len(w) > 4 and w.endswith("s") and not w.endswith("ss") else w
+            for w in WORD_PATTERN.findall(text.lower())]
+
+
+class LocationCatalog(NamedTuple):
+    """
+    Location id -> title, roles tuple and role count.
+    """
+    titles: Tuple[str, ...]
+    roles: Tuple[Tuple[str, ...], ...]
+    role_counts: np.ndarray
+
+    def __len__(self):
+        return len(self.titles)
+
+    def index(self, title: str) -> int:
+        return self.titles.index(title)
+
+    def location(self, idx: int) -> dict:
+        # fresh dict so callers may modify the roles list
+        return {"title": self.titles[idx], "roles": list(self.roles[idx])}
+
+    def to_dicts(self) -> List[dict]:
+        """
+        Catalog in the format of locations.json, as used by SpyfallEnv and the dialogue modules.
+        """
+        return [self.location(i) for i in range(len(self))]
+
+
+def parse_catalog(data: dict) -> LocationCatalog:
+    locations = data["locations"]
+    role_counts = np.array([len(loc["roles"]) for loc in locations], dtype=np.int64)
+    role_counts.setflags(write=False)
+    return LocationCatalog(
+        titles=tuple(loc["title"] for loc in locations),
+        roles=tuple(tuple(loc["roles"]) for loc in locations),
+        role_counts=role_counts,
+    )
+
+
+@lru_cache(maxsize=None)
+def load_catalog(path: str = CATALOG_PATH) -> LocationCatalog:
+    with open(path) as f:
+        return parse_catalog(json.load(f))
+
+
+def refresh_catalog(url: str = REMOTE_URL, path: str = CATALOG_PATH) -> LocationCatalog:
+    """
+    Optionally refreshes the bundled catalog from a remote locations.json.
+    """
+    import requests
+
+    response = requests.get(url, timeout=10)
+    response.raise_for_status()
+    catalog = parse_catalog(response.json())
+    with open(path, "w") as f:
+        json.dump({"locations": catalog.to_dicts()}, f, indent=4)
+        f.write("\n")
+    load_catalog.cache_clear()
+    return catalog
+
+
+if __name__ == "__main__":
+    catalog = load_catalog()
+    print(f"{len(catalog)} locations, {catalog.role_counts.sum()} roles")
+    print(catalog.location(0))
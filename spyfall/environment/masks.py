@@ -0,0 +1,71 @@
+"""
+Precomputed action masks for Spyfall.
+
+Every legal action mask only depends on the game phase and a single agent index,
+so all of them are built once per player count and looked up instead of being
+rebuilt with np.outer on every step. Masks have shape (5 action types, num_players).
+"""
+from functools import lru_cache
+
+import numpy as np
+
+NUM_ACTION_TYPES = 5
+
+# phases, the agent index used to look up the mask is given in brackets
+ASK = 0  # start of game or round: ask any other agent [acting agent]
+ANSWER = 1  # answer the agent that asked [last agent]
+TURN = 2  # after answering: ask or accuse any other agent [acting agent]
+SPY_TURN = 3  # after answering as the spy: ask, accuse or guess [acting agent]
+VOTE = 4  # vote on the accused agent [accused agent]
+GUESS = 5  # spy guesses the location [spy agent]
+NUM_PHASES = 6
+
+_PHASE_ACTIONS = {
+    ASK: [1, 0, 0, 0, 0],
+    ANSWER: [0, 1, 0, 0, 0],
+    TURN: [1, 0, 1, 0, 0],
+    SPY_TURN: [1, 0, 1, 0, 1],
+    VOTE: [0, 0, 0, 1, 0],
+    GUESS: [0, 0, 0, 0, 1],
+}
+# phases that target every agent except the indexed one, the others target only the indexed agent
+_EXCLUDE_AGENT = (ASK, TURN, SPY_TURN)
+
+
+@lru_cache(maxsize=None)
+def action_mask_table(num_players: int) -> np.ndarray:
+    """
+    Returns a read-only int8 table of shape (NUM_PHASES, num_players, 5, num_players).
+    table[phase, agent] is the action mask for that phase, see the phase constants for
+    which agent index applies. Lookups are views and must not be modified.
+    """
+    table = np.zeros((NUM_PHASES, num_players, NUM_ACTION_TYPES, num_players), dtype=np.int8)
+    eye = np.eye(num_players, dtype=np.int8)
+    for phase, actions in _PHASE_ACTIONS.items():
+        agent_masks = 1 - eye if phase in _EXCLUDE_AGENT else eye
+        table[phase] = np.array(actions, dtype=np.int8)[None, :, None] * agent_masks[:, None, :]
+    table.setflags(write=False)
+    return table
+
+
+if __name__ == "__main__":
+    import timeit
+
+    num_players = 4
+    table = action_mask_table(num_players)
+
+    def outer_masks():
+        # per-step construction used by SpyfallEnv before the lookup table
+        agent_mask = np.ones((num_players), dtype=np.int8)
+        agent_mask[1] = 0
+        action_mask = np.array([1, 0, 1, 0, 0], dtype=np.int8)
+        return np.outer(action_mask, agent_mask)
+
+    def table_masks():
+        return table[TURN, 1]
+
+    assert (outer_masks() == table_masks()).all()
+    n = 100_000
+    for name, fn in [("np.outer", outer_masks), ("lookup table", table_masks)]:
+        seconds = min(timeit.repeat(fn, number=n, repeat=5))
+        print(f"{name}: {seconds / n * 1e9:.0f} ns per mask")
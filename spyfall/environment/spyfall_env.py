@@ -1,19 +1,26 @@
 """
 Spyfall Environment for multi-agent social deduction game.
 """
-import requests
-import json
+import inspect
 import random
+from contextlib import nullcontext
 from typing import List, Union
 
 import torch
 import numpy as np
-from gymnasium.spaces import Box
-from torchrl.envs.libs.pettingzoo import PettingZooWrapper
+from gymnasium.spaces import Box, Discrete
 from pettingzoo import AECEnv
 
-from spyfall.agents.modules.dialogue import DialogueModule
-from spyfall.agents.dialogue import DialogueAgent, OpenAIGenerator, OPENAI_API_KEY
+from spyfall.agents.cache import ResponseCache
+from spyfall.environment import masks
+from spyfall.environment.encoders import DialogueEncoder, HashedNgramEncoder, SymbolicEncoder
+from spyfall.environment.location_belief import LocationBelief
+from spyfall.environment.locations import load_catalog
+from spyfall.environment.suspicion import SuspicionTracker
+from spyfall.environment.symbolic import SymbolicResponder
+from spyfall.environment.turn_log import TurnLog
+
+# dspy, openai and torchrl are imported on first use, see dialogue_agent and init_env
 
 class SpyfallAgent(AECEnv):
     metadata = {
@@ -28,7 +35,37 @@ class SpyfallEnv(AECEnv):
         "description": "Multi-agent social deduction game.",
     }
 
-    def __init__(self, num_players, observation_dim, locations: List[dict]=None):
+    def __init__(
+            self,
+            num_players,
+            observation_dim,
+            locations: List[dict]=None,
+            encoder: DialogueEncoder=None,
+            concurrent_votes: bool=False,
+            response_cache: ResponseCache=None,
+            symbolic: bool=False,
+            responder: SymbolicResponder=None,
+            context_budget: int=None,
+            suspicion_interval: int=None,
+            guess_shortlist: int=None,
+            baseline_guess: bool=False,
+            categorical_actions: bool=False,
+            clock: "SharedClock"=None,
+            verbose: bool=None
+        ):
+        """
+        symbolic: skip text generation, votes and guesses come from responder and
+            observations encode the (agent, action type, target) move history
+        context_budget: prompt token budget for the dialogue history, see ContextBuilder
+        suspicion_interval: refresh the suspicion beliefs with the Suspicion LM every this many turns
+        guess_shortlist: offer only the spy's top guess_shortlist locations in the Guess prompt
+        baseline_guess: the spy guesses its most likely location without the LM
+        categorical_actions: Discrete(5 * num_players) action spaces and flat action masks,
+            an action is action_type * num_players + target. Action values of shape
+            (5, num_players) are accepted either way.
+        clock: SharedClock that gets the time of each step under "env" and of LM calls under "lm"
+        verbose: print game events, defaults to True unless symbolic
+        """
         super().__init__()
         self.num_players = num_players
         self.observation_dim = observation_dim
@@ -38,19 +75,34 @@ class SpyfallEnv(AECEnv):
         self.timestep = None
         self.possible_agents = [f"agent_{i}" for i in range(num_players)]
         self.agents = self.possible_agents
-        self.suspicions = None
         self.accused_agent = None
         self.votes = None
+        # votes dispatched concurrently when voting starts, consumed in agent order
+        self.concurrent_votes = concurrent_votes
+        self.prefetched_votes = {}
         self.spy_idx = None
         self.infos = None
-        self.rewards = None
-        self.terminations = None
-        self.truncations = None
             
         # self.dialogue_agent = DialogueAgent(self.spy_idx, locations, OpenAIGenerator(OPENAI_API_KEY))
-        self.dialogue_agent = DialogueModule(self.spy_idx, locations)
-        self.dialogue_history = None
+        self.response_cache = response_cache
+        self.context_budget = context_budget
+        self._dialogue_agent = None
+        # reused across games, cleared on reset
+        self.dialogue_history = TurnLog(self.possible_agents)
+        self.suspicion = SuspicionTracker(num_players, interval=suspicion_interval)
+        # the spy's posterior over locations, from the messages of the other agents
+        self.location_belief = LocationBelief(locations or [])
+        self.guess_shortlist = guess_shortlist
+        self.baseline_guess = baseline_guess
         self.player_message = None
+        self.game_id = -1
+        self.symbolic = symbolic
+        self.responder = responder if responder is not None else SymbolicResponder()
+        self.verbose = not symbolic if verbose is None else verbose
+        self.clock = clock
+        if encoder is None:
+            encoder = SymbolicEncoder(observation_dim, num_players) if symbolic else HashedNgramEncoder(observation_dim)
+        self.encoder = encoder
 
         # observation space is encoded dialogue history
         self.observation_spaces = {
@@ -58,71 +110,106 @@ class SpyfallEnv(AECEnv):
             for a in self.possible_agents
         }
 
-        self.action_spaces = {
-            a: Box(
-                low=-np.inf,
-                high=np.inf,
-                shape=(5, self.num_players)
-            )  # 5 action types, num_players target agents
-            for a in self.possible_agents   
-        }
+        self.categorical_actions = categorical_actions
+        if categorical_actions:
+            self.action_spaces = {a: Discrete(5 * self.num_players) for a in self.possible_agents}
+        else:
+            self.action_spaces = {
+                a: Box(
+                    low=-np.inf,
+                    high=np.inf,
+                    shape=(5, self.num_players)
+                )  # 5 action types, num_players target agents
+                for a in self.possible_agents   
+            }
  
         self.action_masks = {}
+        self.mask_table = masks.action_mask_table(num_players)
+        self.agent_index = {a: i for i, a in enumerate(self.possible_agents)}
         self.agent_selection = self.possible_agents[0]
 
+        # fixed per-agent buffers, rewritten in place after every reset and step.
+        # observations, rewards, terminations, truncations and infos hold views into them,
+        # copy to keep a value.
+        self.observation_buffer = torch.zeros(num_players, observation_dim)
+        self.action_mask_buffer = torch.zeros(num_players, 5, num_players, dtype=torch.bool)
+        self.suspicion_buffer = torch.zeros(num_players, num_players)
+        self.is_spy_buffer = torch.zeros(num_players, dtype=torch.bool)
+        self.reward_buffer = torch.zeros(num_players)
+        self.terminated_buffer = torch.zeros(num_players, dtype=torch.bool)
+        self.truncated_buffer = torch.zeros(num_players, dtype=torch.bool)
+        # numpy views sharing memory with the buffers, cheaper to write from numpy and python values
+        self._buffer_views = [
+            buffer.numpy() for buffer in (
+                self.observation_buffer, self.action_mask_buffer, self.suspicion_buffer, self.is_spy_buffer,
+            )
+        ]
+        self._rewards, self._terminated, self._truncated = (
+            buffer.numpy() for buffer in (self.reward_buffer, self.terminated_buffer, self.truncated_buffer)
+        )
+        self.observations = {a: self.observation_buffer[i] for i, a in enumerate(self.possible_agents)}
+        self.rewards = {a: self.reward_buffer[i] for i, a in enumerate(self.possible_agents)}
+        self.terminations = {a: self.terminated_buffer[i] for i, a in enumerate(self.possible_agents)}
+        self.truncations = {a: self.truncated_buffer[i] for i, a in enumerate(self.possible_agents)}
+        self.infos = {a: {
+            "action_mask": self.action_mask_buffer[i].view(-1) if categorical_actions else self.action_mask_buffer[i],
+            "suspicion": self.suspicion_buffer[i],
+            # each agent's own role, for role-conditioned policies and critics
+            "is_spy": self.is_spy_buffer[i],
+        } for i, a in enumerate(self.possible_agents)}
+
+    @property
+    def dialogue_agent(self):
+        # created on first use so importing and resetting the env doesn't load the LM stack
+        if self._dialogue_agent is None:
+            from spyfall.agents.context import ContextBuilder
+            from spyfall.agents.modules.dialogue import DialogueModule
+            context = ContextBuilder(self.context_budget) if self.context_budget is not None else None
+            self._dialogue_agent = DialogueModule(self.spy_idx, self.locations, cache=self.response_cache, context=context)
+        return self._dialogue_agent
+
+    def _timed(self, section: str):
+        return self.clock.timed(section) if self.clock is not None else nullcontext()
+
+    def _log(self, *args):
+        if self.verbose:
+            print(*args)
+
     def set_player_message(self, message):
         self.player_message = message
 
     def _select_location(self):
         return random.choice(self.locations)
     
-    def _outer_product(self, action_mask, agent_mask):
-        return np.outer(action_mask, agent_mask)
+    def _set_all_action_masks(self, action_mask):
+        for a in self.agents:
+            self.action_masks[a] = action_mask
 
     def _update_action_masks(self, action_type, last_agent, last_target, next_agent):
-        agent_mask = np.zeros((self.num_players), dtype=np.int8)
-        last_agent = self.agents.index(last_agent)
+        last_agent = self.agent_index[last_agent]
 
         if action_type == 0:  # Question asked
             # only allow answering directed at last agent
-            agent_mask[last_agent] = 1
-            action_mask = np.array([0, 1, 0, 0, 0], dtype=np.int8)     
-            self.action_masks[next_agent] = self._outer_product(action_mask, agent_mask)
-
+            self.action_masks[next_agent] = self.mask_table[masks.ANSWER, last_agent]
         elif action_type == 1:  # Question answered
-            if next_agent == self.spy_idx:
-                # only allow asking questions
-                agent_mask = np.ones((self.num_players), dtype=np.int8)
-                agent_mask[last_agent] = 0
-                action_mask = np.array([1, 0, 1, 0, 1], dtype=np.int8)
-                self.action_masks[next_agent] = self._outer_product(action_mask, agent_mask)
-            else:
-                # only allow asking questions
-                # invert agent mask instaed of creating new array
-                agent_mask = np.ones((self.num_players), dtype=np.int8)
-                agent_mask[last_agent] = 0
-                action_mask = np.array([1, 0, 1, 0, 0], dtype=np.int8)
-                self.action_masks[next_agent] = self._outer_product(action_mask, agent_mask)
+            # only allow asking questions or accusing, the spy may also guess
+            phase = masks.SPY_TURN if next_agent == self.spy_idx else masks.TURN
+            self.action_masks[next_agent] = self.mask_table[phase, last_agent]
         elif action_type == 2:  # Accusation made
             # only allow voting
-            agent_mask[self.accused_agent] = 1
-            action_mask = np.array([0, 0, 0, 1, 0], dtype=np.int8)
-            self.action_masks = {a: self._outer_product(action_mask, agent_mask) for a in self.agents}  # Only allow voting
+            self._set_all_action_masks(self.mask_table[masks.VOTE, self.accused_agent])
         elif action_type == 3:  # Vote
             # only allow voting
-            agent_mask[self.accused_agent] = 1
-            action_mask = np.array([0, 0, 0, 1, 0], dtype=np.int8)
-            self.action_masks = {a: self._outer_product(action_mask, agent_mask) for a in self.agents}  # Only allow voting
+            self._set_all_action_masks(self.mask_table[masks.VOTE, self.accused_agent])
         elif action_type == 4:  # Spy guesses location
             # only allow guessing
-            agent_mask[int(next_agent.replace("agent_", ""))] = 1
-            action_mask = np.array([0, 0, 0, 0, 1], dtype=np.int8)
-            self.action_masks = {a: self._outer_product(action_mask, agent_mask) for a in self.agents}  # Only allow guessing
+            self._set_all_action_masks(self.mask_table[masks.GUESS, self.agent_index[next_agent]])
         else:
             raise ValueError(f"Invalid action type: {action_type}")
 
     def _initiate_voting(self, accused_agent: Union[int, str]):
         self.votes = {a: None for a in self.agents}
+        self.prefetched_votes = {}
         self.accused_agent = int(accused_agent.replace("agent_", "")) if isinstance(accused_agent, str) else accused_agent
 
     def _process_vote(self, voting_agent, vote):
@@ -136,17 +223,17 @@ class SpyfallEnv(AECEnv):
         # Exclude the spy's vote from the tally
         non_spy_votes = {agent: vote for agent, vote in self.votes.items() if agent != self.spy_idx}
         if all(vote == 1 for vote in non_spy_votes.values()):
-            if self.accused_agent == self.spy_idx:
-                print("Spy identified! Non-spies win.")
+            if self.accused_agent == self.agent_index[self.spy_idx]:
+                self._log("Spy identified! Non-spies win.")
                 # TODO reward agents
                 return "non-spy-win"
             else:
-                print("Wrong accusation! Spy wins.")
+                self._log("Wrong accusation! Spy wins.")
                 # TODO reward agents
                 return "spy-win"
                 
         else:
-            print("Not unanimous. Continue game.")
+            self._log("Not unanimous. Continue game.")
             return "continue"
 
     def _process_spy_guess(self, spy_agent, guess):
@@ -158,54 +245,67 @@ class SpyfallEnv(AECEnv):
 
     def _assign_roles(self, roles: List[str]):
         # assign a random role to an agent, with one role being the spy
+        roles = list(roles)
         agent_roles = {}
         for agent in self.agents:
             agent_roles[agent] = random.choice(roles)
             roles.remove(agent_roles[agent])
         self.spy_idx = random.choice(self.agents)
         agent_roles[self.spy_idx] = "spy"
-        self.dialogue_agent.set_spy_idx(self.spy_idx)
-        print(f"Agent roles: {agent_roles}")
+        if self._dialogue_agent is not None:
+            self._dialogue_agent.set_spy_idx(self.spy_idx)
+        self._log(f"Agent roles: {agent_roles}")
         return agent_roles
 
     def reset(self, seed=None):
         location_and_roles = self._select_location()
-        print("Location: ", location_and_roles["title"])
+        self._log("Location: ", location_and_roles["title"])
 
         self.location = location_and_roles["title"]
         self.agents = self.possible_agents
         self.roles = self._assign_roles(location_and_roles["roles"])
         self.timestep = 0
+        self.agent_selection = self.possible_agents[0]
 
-        self.dialogue_history = []
+        self.dialogue_history.clear()
+        self.suspicion.reset(self.agent_index[self.spy_idx], location_and_roles)
+        self.location_belief.reset()
         self.votes = {a: None for a in self.agents}
+        self.prefetched_votes = {}
         self.accused_agent = None
-        # starting ction mask for each agent is ask question
-        action_mask = np.array([1, 0, 0, 0, 0], dtype=np.int8)
+        # starting action mask for each agent is ask question
         for i, a in enumerate(self.agents):
-            agent_mask = np.ones((self.num_players), dtype=np.int8)
-            agent_mask[i] = 0
-            outer_product = np.outer(action_mask, agent_mask)
-            self.action_masks[a] = outer_product
-
-        encoded_dialogue_history = torch.rand(self.observation_dim)
-        self.observations = {a: {
-            "observation": encoded_dialogue_history,
-            # "action_mask": self.action_masks[a]
-        } for a in self.agents}
-        # self.observations = {a: encoded_dialogue_history for a in self.agents}
-
-        self.infos = {a: 
-            # {}
-            {"action_mask": self.action_masks[a]} 
-            for a in self.agents 
-        }
-        self.rewards = {a: 0 for a in self.agents}
-        self.terminations = {a: False for a in self.agents}
-        self.truncations = {a: False for a in self.agents}
+            self.action_masks[a] = self.mask_table[masks.ASK, i]
+
+        self.game_id += 1
+        self.encoder.reset(self.game_id, self.agents, self.roles, self.location)
+        self._clear_outcome()
+        self._write_buffers()
 
         return self.observations, self.infos
-    
+
+    def _write_buffers(self):
+        observation, action_mask, suspicion, is_spy = self._buffer_views
+        observation[:] = self.encoder.observations()
+        for i, a in enumerate(self.possible_agents):
+            action_mask[i] = self.action_masks[a]
+        suspicion[:] = self.suspicion.beliefs
+        is_spy[:] = [a == self.spy_idx for a in self.possible_agents]
+
+    def _clear_outcome(self):
+        self._rewards[:] = 0
+        self._terminated[:] = False
+        self._truncated[:] = False
+
+    def _end_game(self, agent: str, reward: int):
+        """
+        agent receives reward, every other agent -reward.
+        """
+        self._rewards[:] = -reward
+        self._rewards[self.agent_index[agent]] = reward
+        self._terminated[:] = True
+        self._truncated[:] = True
+
     def _next_voting_agent(self):
         return next((a for a in self.agents if self.votes[a] is None), None)
     
@@ -216,34 +316,85 @@ class SpyfallEnv(AECEnv):
             self.agent_selection = agent
 
     def add_dialogue_history(self, current_agent, action_type, target_agent, dialogue):
-        self.dialogue_history.append((current_agent, action_type, target_agent, dialogue))
+        self.dialogue_history.append(current_agent, action_type, target_agent, dialogue)
+        self.encoder.update(self.game_id, len(self.dialogue_history) - 1, current_agent, action_type, target_agent, dialogue)
+        self.suspicion.update(self.agent_index[current_agent], action_type, self.agent_index[target_agent], dialogue)
+        if action_type in (0, 1) and current_agent != self.spy_idx:
+            self.location_belief.update(dialogue)
+        if self.suspicion.due() and not self.symbolic:
+            with self._timed("lm"):
+                suspicion = self.dialogue_agent.suspicion(self.dialogue_history, self.num_players)
+            if suspicion is not None:
+                self.suspicion.refresh(suspicion)
+
+    def _dialogue_observation(self, current_agent, action_type: int):
+        # only the spy's Guess prompt uses the shortlist
+        shortlist = action_type == 4 and self.guess_shortlist
+        return {
+            "current_player": current_agent, 
+            "num_players": self.num_players, 
+            "location": self.location, 
+            "role": self.roles[current_agent], 
+            "dialogue_history": self.dialogue_history,
+            "location_shortlist": self.location_belief.top_k(self.guess_shortlist) if shortlist else None,
+        }
+
+    def _prefetch_votes(self, target_agent):
+        """
+        Generates the votes of every agent that has not voted yet concurrently.
+        Votes don't depend on each other, so all of them see the dialogue history
+        at the start of the vote. They are applied one per step in agent order.
+        """
+        voters = [a for a in self.agents if self.votes[a] is None]
+        with self._timed("lm"):
+            predictions = self.dialogue_agent.forward_many(
+                [(self._dialogue_observation(a, 3), [3, target_agent]) for a in voters]
+            )
+        self.prefetched_votes = {
+            a: getattr(p, p.keys()[0]) for a, p in zip(voters, predictions)
+        }
 
     def handle_action(self, current_agent, action_type, target_agent, dialogue_template: str):
         if self.player_message is not None:
             message = self.player_message
+        elif self.symbolic:
+            message = self.responder.respond(action_type, self.location, self.locations)
+        elif action_type == 4 and self.baseline_guess:
+            message = self.location_belief.guess()
+        elif action_type == 3 and self.concurrent_votes:
+            if current_agent not in self.prefetched_votes:
+                self._prefetch_votes(target_agent)
+            message = self.prefetched_votes.pop(current_agent)
         else:
-            message = self.dialogue_agent.forward(
-                {
-                    "current_player": current_agent, 
-                    "num_players": self.num_players, 
-                    "location": self.location, 
-                    "role": self.roles[current_agent], 
-                    "dialogue_history": self.dialogue_history
-                },
-                [action_type, target_agent]
-            )
+            with self._timed("lm"):
+                message = self.dialogue_agent.forward(
+                    self._dialogue_observation(current_agent, action_type),
+                    [action_type, target_agent]
+                )
             message = getattr(message, message.keys()[0])
 
-        dialogue = dialogue_template.format(current_agent=current_agent, target_agent=target_agent, message=message)
+        if self.symbolic:
+            dialogue = ""
+        else:
+            dialogue = dialogue_template.format(current_agent=current_agent, target_agent=target_agent, message=message)
         self.add_dialogue_history(current_agent, action_type, target_agent, dialogue)
 
         return message
     
-    def _get_current_action(self, action: np.ndarray):
+    def _get_current_action(self, agent, action):
         """
-        action is a numpy array of shape (len(action_types), len(self.agents))
-        Current action is coordinate of max value in action array
+        action is either a flat integer index action_type * num_players + target_agent,
+        or action values of shape (len(action_types), len(self.agents)) whose masked
+        argmax is the current action.
         """
+        action_mask = self.action_masks[agent]
+        if np.size(action) == 1:
+            action = int(np.asarray(action).item())
+            action_type, target_agent = divmod(action, self.num_players)
+            if not 0 <= action_type < len(action_mask) or not action_mask[action_type, target_agent]:
+                raise ValueError(f"Action {action} is not legal for {agent}")
+            return action_type, target_agent
+        action = self._apply_action_mask(action_mask, action)
         action_type, target_agent = np.unravel_index(np.argmax(action), action.shape)
         return action_type, target_agent
     
@@ -251,24 +402,24 @@ class SpyfallEnv(AECEnv):
         return np.where(action_mask == 1, action, -np.inf)
 
     def step(self, action):
+        with self._timed("env"):
+            return self._step(action)
+
+    def _step(self, action):
         self.timestep += 1
-        current_action = action
         current_agent = self.agent_selection
-        self.rewards = {a: 0 for a in self.agents}
-        self.terminations = {a: False for a in self.agents}
-        self.truncations = {a: False for a in self.agents}
+        self._clear_outcome()
         result = None
-        
-        current_action = self._apply_action_mask(self.action_masks[current_agent], current_action)
-        action_type, target_agent = self._get_current_action(current_action)
+
+        action_type, target_agent = self._get_current_action(current_agent, action)
         target_agent = self.agents[target_agent]
         if action_type == 0:  # Question asked
             # check to see if target_agent was target of last dialogue
             if len(self.dialogue_history) > 0:
-                last_target = self.dialogue_history[-1][2]
+                last_target = self.dialogue_history.target(-1)
                 if target_agent == last_target:
                     # TODO how to handle in policy?
-                    print("Target agent was target of last dialogue. Sampling a random other last target.")
+                    self._log("Target agent was target of last dialogue. Sampling a random other last target.")
                     target_agent = random.choice([a for a in self.agents if a != last_target and a != current_agent])
 
             self.handle_action(current_agent, action_type, target_agent,
@@ -294,20 +445,7 @@ class SpyfallEnv(AECEnv):
                 "<Player {current_agent}> guessed: {message}.")
             
             spy_correct = self._process_spy_guess(current_agent, guess)
-            if spy_correct:
-                self.rewards = {a: 0 for a in self.agents}
-                self.rewards[current_agent] = 1
-                for a in [a for a in self.agents if a != current_agent]:
-                    self.rewards[a] = -1
-                self.terminations = {a: True for a in self.agents}
-                self.truncations = {a: True for a in self.agents}
-            else:
-                self.rewards = {a: 0 for a in self.agents}
-                self.rewards[current_agent] = -1
-                for a in [a for a in self.agents if a != current_agent]:
-                    self.rewards[a] = 1
-                self.terminations = {a: True for a in self.agents}
-                self.truncations = {a: True for a in self.agents}
+            self._end_game(current_agent, 1 if spy_correct else -1)
             self._set_next_agent(current_agent)
         else:
             raise ValueError(f"Invalid action type: {action_type}")
@@ -318,19 +456,10 @@ class SpyfallEnv(AECEnv):
         if result in ["spy-win", "non-spy-win"]:
             # if a non-spy receives majority of votes, spy wins and game is over
             if result == "spy-win":
-                self.rewards = {a: 0 for a in self.agents}
-                self.rewards[self.spy_idx] = 1
-                for a in [a for a in self.agents if a != self.spy_idx]:
-                    self.rewards[a] = -1
-                self.terminations = {a: True for a in self.agents}
-                self.truncations = {a: True for a in self.agents}
+                self._end_game(self.spy_idx, 1)
             elif result == "non-spy-win":
                 # spy gets a chance to guess location
-                agent_mask = np.zeros((self.num_players), dtype=np.int8)
-                agent_mask[self.spy_idx] = 1
-                action_mask = np.array([0, 0, 0, 0, 1], dtype=np.int8)
-                outer_product = np.outer(action_mask, agent_mask)
-                self.action_masks[self.spy_idx] = outer_product
+                self.action_masks[self.spy_idx] = self.mask_table[masks.GUESS, self.agent_index[self.spy_idx]]
                 self._set_next_agent(self.spy_idx)
         elif result == "continue":
             # reset votes
@@ -339,31 +468,22 @@ class SpyfallEnv(AECEnv):
             self._set_next_agent(self.accused_agent)
             self.accused_agent = None
             # reset action masks
-            action_mask = np.array([1, 0, 0, 0, 0], dtype=np.int8)
             for i, a in enumerate(self.agents):
-                agent_mask = np.ones((self.num_players), dtype=np.int8)
-                agent_mask[i] = 0
-                outer_product = np.outer(action_mask, agent_mask)
-                self.action_masks[a] = outer_product
+                self.action_masks[a] = self.mask_table[masks.ASK, i]
 
         if self.timestep > 100:
-            self.terminations = {a: True for a in self.agents}
-            self.truncations = {a: True for a in self.agents}
-
-        encoded_dialogue_history = torch.rand(self.observation_dim)
-        self.observations = {a: encoded_dialogue_history for a in self.agents}
-        self.observation = encoded_dialogue_history
-        self.infos = {a: {
-            "action_mask": self.action_masks[a],
-        } for a in self.agents}
+            self._terminated[:] = True
+            self._truncated[:] = True
 
+        self._write_buffers()
         self.log_step()
 
         return self.observations, self.rewards, self.terminations, self.truncations, self.infos
 
     def log_step(self):
-        last_dialogue = self.dialogue_history[-1]
-        dialogue = last_dialogue[3]
+        if not self.verbose:
+            return
+        dialogue = self.dialogue_history.message(-1)
         print(f"[Step {self.timestep}]: '{dialogue}'")
 
     def render(self):
@@ -373,30 +493,46 @@ class SpyfallEnv(AECEnv):
         return self.observation_spaces[agent]
     
     def observe(self, agent):
-        # TODO encoded dialogue history as vector
-        encoded_dialogue_history = torch.rand((1, self.observation_dim))
-        return encoded_dialogue_history
+        return self.observation_buffer[self.agent_index[agent]]
 
     def action_space(self, agent):
         return self.action_spaces[agent]
 
-def init_env(num_players: int, observation_dim: int, device: torch.device, wrapped: bool=True) -> PettingZooWrapper:
-    response = requests.get("https://raw.githubusercontent.com/PepsRyuu/spyfall/master/locations.json")
-    locations= json.loads(response.text)['locations']
+def init_env(
+        num_players: int,
+        observation_dim: int,
+        device: torch.device,
+        wrapped: bool=True,
+        concurrent_votes: bool=False,
+        symbolic: bool=False,
+        categorical_actions: bool=False,
+        clock: "SharedClock"=None
+    ) -> "PettingZooWrapper":
+    locations = load_catalog().to_dicts()
 
     env = SpyfallEnv(
         num_players=num_players,
         locations=locations,
-        observation_dim=observation_dim
+        observation_dim=observation_dim,
+        concurrent_votes=concurrent_votes,
+        symbolic=symbolic,
+        categorical_actions=categorical_actions,
+        clock=clock
     )
 
     if wrapped:
+        from torchrl.envs.libs.pettingzoo import PettingZooWrapper
+
+        wrapper_kwargs = {}
+        # only accepted by some torchrl versions
+        if "shared_observation_space" in inspect.signature(PettingZooWrapper._build_env).parameters:
+            wrapper_kwargs["shared_observation_space"] = True
         return PettingZooWrapper(
             env=env,
             use_mask=True,
             device=device,
-            categorical_actions=False,
-            shared_observation_space=True
+            categorical_actions=categorical_actions,
+            **wrapper_kwargs
         )
     else:
         return env
@@ -0,0 +1,93 @@
+"""
+Incremental belief of each agent over who the spy is.
+"""
+from typing import Optional
+
+import numpy as np
+
+from spyfall.environment.locations import words
+
+ASK, ANSWER, ACCUSE = 0, 1, 2
+# hits beyond this don't make a message more convincing
+MAX_HINTS = 3
+
+
+def location_vocab(location: dict) -> frozenset:
+    """
+    Words of a location's title and roles, which non-spies recognize in messages.
+    """
+    return frozenset(words(" ".join([location["title"], *location["roles"]])))
+
+
+class SuspicionTracker:
+    """
+    Beliefs over the spy as a (num_players, num_players) array, row i is agent i's belief.
+
+    The spy knows itself. Every other agent starts uniform over the other players and
+    multiplies in a likelihood per turn: questions and answers that use words of the
+    location make their speaker less likely to be the spy, an accusation makes the
+    accused more likely. Every interval turns the env can mix in the Suspicion LM
+    signature through refresh.
+    """
+
+    def __init__(
+            self,
+            num_players: int,
+            interval: Optional[int] = None,
+            hint_weight: float = 0.5,
+            accuse_weight: float = 1.25,
+            lm_weight: float = 0.5
+        ):
+        """
+        interval: turns between Suspicion LM refreshes, None to never refresh
+        """
+        if interval is not None and interval < 1:
+            raise ValueError(f"interval must be None or at least 1, got {interval}")
+        self.num_players = num_players
+        self.interval = interval
+        self.hint_weight = hint_weight
+        self.accuse_weight = accuse_weight
+        self.lm_weight = lm_weight
+        self.beliefs = np.zeros((num_players, num_players), dtype=np.float32)
+        self._observers = np.ones(num_players, dtype=bool)
+        self.vocab = frozenset()
+        self.turns = 0
+
+    def reset(self, spy: int, location: dict):
+        self.vocab = location_vocab(location)
+        self.turns = 0
+        self._observers[:] = True
+        self._observers[spy] = False
+        self.beliefs[:] = 1 / (self.num_players - 1)
+        np.fill_diagonal(self.beliefs, 0)
+        self.beliefs[spy] = 0
+        self.beliefs[spy, spy] = 1
+
+    def _apply(self, likelihood: np.ndarray):
+        beliefs = self.beliefs[self._observers] * likelihood
+        beliefs /= beliefs.sum(axis=1, keepdims=True)
+        self.beliefs[self._observers] = beliefs
+
+    def update(self, speaker: int, action_type: int, target: int, message: str):
+        likelihood = np.ones(self.num_players, dtype=np.float32)
+        if action_type in (ASK, ANSWER) and message:
+            hits = sum(word in self.vocab for word in words(message))
+            likelihood[speaker] = np.exp(-self.hint_weight * min(hits, MAX_HINTS))
+        elif action_type == ACCUSE:
+            likelihood[target] = self.accuse_weight
+        self._apply(likelihood)
+        self.turns += 1
+
+    def due(self) -> bool:
+        """
+        True every interval turns, when the env should call refresh.
+        """
+        return self.interval is not None and self.turns % self.interval == 0
+
+    def refresh(self, suspicion: np.ndarray):
+        """
+        Mixes in an external (num_players,) suspicion vector in [0, 1], NaN entries are ignored.
+        """
+        suspicion = np.nan_to_num(suspicion, nan=0.5)
+        likelihood = 1 - self.lm_weight + self.lm_weight * np.clip(suspicion, 0.05, 1.0)
+        self._apply(likelihood.astype(np.float32))
@@ -0,0 +1,28 @@
+"""
+Rules-only stand-in for the dialogue backend, used by SpyfallEnv's symbolic mode.
+
+Only votes and location guesses affect the game dynamics, so those are sampled
+directly instead of generated by an LLM. Every other action produces no text.
+"""
+import random
+from typing import List
+
+
+class SymbolicResponder:
+    def __init__(self, vote_prob: float = 0.5, guess_prob: float = None):
+        """
+        Votes are "Yes" with probability vote_prob, location guesses are correct with
+        probability guess_prob (1 / number of locations by default).
+        """
+        self.vote_prob = vote_prob
+        self.guess_prob = guess_prob
+
+    def respond(self, action_type: int, location: str, locations: List[dict]) -> str:
+        if action_type == 3:  # Vote
+            return "Yes" if random.random() < self.vote_prob else "No"
+        elif action_type == 4:  # Guess
+            guess_prob = 1 / len(locations) if self.guess_prob is None else self.guess_prob
+            if random.random() < guess_prob:
+                return location
+            return random.choice([loc["title"] for loc in locations if loc["title"] != location])
+        return ""
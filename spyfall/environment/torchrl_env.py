@@ -0,0 +1,172 @@
+"""
+Native torchrl environment for batched, rules-only Spyfall.
+
+Wraps BatchedSpyfallEnv directly, without the PettingZoo AEC translation layer.
+All agents form one group, "agents", so every per-agent entry has shape
+(num_games, num_players, ...). Only the selected agent's action is applied in
+each game; ("agents", "selected") marks that agent.
+
+With categorical_actions, actions are flat indices action_type * num_players + target
+and action masks are flattened to match.
+"""
+from typing import List, Optional, Union
+
+import numpy as np
+import torch
+from tensordict import TensorDict, TensorDictBase
+from torchrl.envs import EnvBase
+
+try:
+    from torchrl.data import Bounded, Categorical, Composite, Unbounded
+except ImportError:  # torchrl < 0.6
+    from torchrl.data import (
+        BoundedTensorSpec as Bounded,
+        CompositeSpec as Composite,
+        DiscreteTensorSpec as Categorical,
+        UnboundedContinuousTensorSpec as Unbounded,
+    )
+
+from spyfall.environment.batched_env import BatchedSpyfallEnv
+from spyfall.environment.locations import LocationCatalog
+from spyfall.environment.masks import NUM_ACTION_TYPES
+
+
+class SpyfallTorchRLEnv(EnvBase):
+    def __init__(
+            self,
+            num_games: int,
+            num_players: int,
+            observation_dim: int,
+            locations: Union[LocationCatalog, List[dict]] = None,
+            device: Union[torch.device, str] = "cpu",
+            seed: int = None,
+            categorical_actions: bool = False,
+            clock: "SharedClock" = None,
+            **env_kwargs
+        ):
+        """
+        clock: SharedClock that gets the time of each step under "env"
+        env_kwargs are passed to BatchedSpyfallEnv (vote_fn, guess_fn, max_steps, ...).
+        """
+        super().__init__(device=device, batch_size=torch.Size([num_games]))
+        self.env = BatchedSpyfallEnv(num_games, num_players, observation_dim, locations=locations, seed=seed, **env_kwargs)
+        self.num_games = num_games
+        self.num_players = num_players
+        self.observation_dim = observation_dim
+        self.categorical_actions = categorical_actions
+        self.clock = clock
+        self._make_specs()
+
+    def _make_specs(self):
+        n, p = self.num_games, self.num_players
+        agents = (n, p)
+        action_shape = (*agents, NUM_ACTION_TYPES * p) if self.categorical_actions else (*agents, NUM_ACTION_TYPES, p)
+        self.observation_spec = Composite(
+            agents=Composite(
+                observation=Unbounded(shape=(*agents, self.observation_dim), dtype=torch.float32, device=self.device),
+                action_mask=Categorical(2, shape=action_shape, dtype=torch.bool, device=self.device),
+                is_spy=Categorical(2, shape=agents, dtype=torch.bool, device=self.device),
+                selected=Categorical(2, shape=agents, dtype=torch.bool, device=self.device),
+                shape=agents,
+            ),
+            shape=(n,),
+        )
+        if self.categorical_actions:
+            action = Categorical(NUM_ACTION_TYPES * p, shape=agents, dtype=torch.int64, device=self.device)
+        else:
+            action = Bounded(-1, 1, shape=action_shape, dtype=torch.float32, device=self.device)
+        self.action_spec = Composite(
+            agents=Composite(action=action, shape=agents),
+            shape=(n,),
+        )
+        self._categorical_spec = self.full_action_spec["agents", "action"]
+        self.reward_spec = Composite(
+            agents=Composite(
+                reward=Unbounded(shape=(*agents, 1), dtype=torch.float32, device=self.device),
+                shape=agents,
+            ),
+            shape=(n,),
+        )
+        self.done_spec = Composite(
+            done=Categorical(2, shape=(n, 1), dtype=torch.bool, device=self.device),
+            terminated=Categorical(2, shape=(n, 1), dtype=torch.bool, device=self.device),
+            truncated=Categorical(2, shape=(n, 1), dtype=torch.bool, device=self.device),
+            shape=(n,),
+        )
+
+    def _tensor(self, array: np.ndarray, dtype: torch.dtype = None) -> torch.Tensor:
+        # zero-copy on cpu, so array must not be modified by the env afterwards
+        return torch.from_numpy(np.ascontiguousarray(array)).to(device=self.device, dtype=dtype)
+
+    def _agents_td(self, observation: np.ndarray) -> TensorDict:
+        env = self.env
+        players = env._players
+        action_mask = env.action_masks.reshape(self.num_games, self.num_players, -1) if self.categorical_actions else env.action_masks
+        action_mask = self._tensor(action_mask, torch.bool)
+        if self.categorical_actions:
+            # so random actions, e.g. from rand_step, are legal
+            self._categorical_spec.update_mask(action_mask)
+        return TensorDict({
+            "observation": self._tensor(observation, torch.float32),
+            "action_mask": action_mask,
+            "is_spy": self._tensor(players == env.spy_idx[:, None]),
+            "selected": self._tensor(players == env.agent_selection[:, None]),
+        }, batch_size=(self.num_games, self.num_players), device=self.device)
+
+    def _done_td(self, done: np.ndarray, truncated: np.ndarray) -> dict:
+        return {
+            "done": self._tensor(done[:, None]),
+            "terminated": self._tensor((done & ~truncated)[:, None]),
+            "truncated": self._tensor(truncated[:, None]),
+        }
+
+    def _reset(self, tensordict: Optional[TensorDictBase] = None, **kwargs) -> TensorDictBase:
+        games = None
+        if tensordict is not None and "_reset" in tensordict.keys():
+            games = tensordict["_reset"].reshape(-1).cpu().numpy()
+        observation, _ = self.env.reset(games)
+        done = self.env.done.copy()
+        return TensorDict({
+            "agents": self._agents_td(observation),
+            **self._done_td(done, np.zeros_like(done)),
+        }, batch_size=self.batch_size, device=self.device)
+
+    def _step(self, tensordict: TensorDictBase) -> TensorDictBase:
+        if self.clock is None:
+            return self._step_games(tensordict)
+        with self.clock.timed("env"):
+            return self._step_games(tensordict)
+
+    def _step_games(self, tensordict: TensorDictBase) -> TensorDictBase:
+        env = self.env
+        action = tensordict["agents", "action"].detach().cpu().numpy()
+        # the selected agent's action in each game, finished games are skipped by the env
+        selected = np.maximum(env.agent_selection, 0)
+        observation, rewards, terminations, truncations, _ = env.step(action[env._games, selected])
+        done = env.done.copy()
+        # truncated: the game hit max_steps instead of ending by a vote or guess
+        truncated = done & (env.timestep > env.max_steps)
+        agents = self._agents_td(observation)
+        # the env reuses its rewards array across steps
+        agents["reward"] = self._tensor(rewards[..., None].copy(), torch.float32)
+        return TensorDict({
+            "agents": agents,
+            **self._done_td(done, truncated),
+        }, batch_size=self.batch_size, device=self.device)
+
+    def _set_seed(self, seed: Optional[int]):
+        self.env._rng = np.random.default_rng(seed)
+
+
+if __name__ == "__main__":
+    import time
+
+    env = SpyfallTorchRLEnv(num_games=1024, num_players=4, observation_dim=16, seed=0)
+    td = env.rollout(3)
+    print(td)
+
+    steps = 200
+    start = time.perf_counter()
+    env.rollout(steps, break_when_any_done=False)
+    elapsed = time.perf_counter() - start
+    print(f"{steps * env.num_games} game steps in {elapsed:.3f}s ({steps * env.num_games / elapsed:.0f} steps/s)")
@@ -1,66 +1,128 @@
+from typing import List, Optional, Union
+
+import torch
 from torchrl.envs.transforms import ActionMask, Transform
 from tensordict.base import TensorDictBase
-from torchrl.envs.transforms.utils import (
-    _set_missing_tolerance,
-)
 from torchrl.envs.transforms.transforms import FORWARD_NOT_IMPLEMENTED
 
 class NestedActionMask(Transform):
-    def __init__(self, agent_keys, action_key="action", mask_key="action_mask"):
-        self.agent_keys = agent_keys
+    """
+    Applies the action masks of nested agent groups, either one group per agent
+    (PettingZooWrapper) or a single stacked group (SpyfallTorchRLEnv).
+
+    The masks of all groups are stacked and moved to the action device once.
+    Discrete action specs get their masks updated after reset and step, and inv
+    fills invalid entries of the stacked actions with fill_value in a single
+    masked_fill, so decoding an action by argmax never picks an invalid one.
+    """
+
+    def __init__(
+            self,
+            agent_keys: Union[str, List[str]],
+            action_key="action",
+            mask_key="action_mask",
+            fill_value: float = float("-inf")
+        ):
+        self.agent_keys = [agent_keys] if isinstance(agent_keys, str) else list(agent_keys)
         self.action_key = action_key
         self.mask_key = mask_key
+        self.fill_value = fill_value
+        # (group position, spec) of the action specs that accept a mask, looked up on first use
+        self._mask_specs = None
 
-        in_keys = ["action", "action_mask"] + [(a, action_key) for a in agent_keys] + [(a, mask_key) for a in agent_keys]
+        in_keys = [(a, mask_key) for a in self.agent_keys]
+        action_keys = [(a, action_key) for a in self.agent_keys]
 
         super().__init__(
-            in_keys=in_keys, out_keys=[], in_keys_inv=[], out_keys_inv=[]
+            in_keys=in_keys, out_keys=[], in_keys_inv=action_keys, out_keys_inv=action_keys
         )
 
     def forward(self, tensordict: TensorDictBase) -> TensorDictBase:
         raise RuntimeError(FORWARD_NOT_IMPLEMENTED.format(type(self)))
 
-    def _call(self, tensordict: TensorDictBase) -> TensorDictBase:
-        parent = self.parent
-        if parent is None:
+    def _stack(self, tensordict: TensorDictBase, key: str, device: torch.device = None) -> Optional[torch.Tensor]:
+        """
+        Entry key of every group stacked along a new leading dim, None if any is missing.
+        """
+        values = [tensordict.get((a, key), None) for a in self.agent_keys]
+        if any(value is None for value in values):
+            return None
+        stacked = values[0].unsqueeze(0) if len(values) == 1 else torch.stack(values)
+        return stacked if device is None else stacked.to(device, non_blocking=True)
+
+    def _update_specs(self, tensordict: TensorDictBase):
+        if self.parent is None:
             raise RuntimeError(
                 f"{type(self)}.parent cannot be None: make sure this transform is executed within an environment."
             )
-        action_spec = self.container.action_spec
-        for agent_key in self.agent_keys:
-            mask_path = (agent_key, self.mask_key)
-            mask = tensordict.get(mask_path)
-            print(mask.shape)
-            print(action_spec)
-            agent_action_path = (agent_key, self.action_key)
-            agent_action_spec = action_spec.get(agent_action_path)
-            print(agent_action_spec)
-            if not isinstance(agent_action_spec, ActionMask.ACCEPTED_SPECS):
-                raise ValueError(
-                    ActionMask.SPEC_TYPE_ERROR.format(ActionMask.ACCEPTED_SPECS, type(agent_action_spec))
-                )
-            agent_action_spec.update_mask(mask.to(action_spec.device))
-            
+        if self._mask_specs is None:
+            action_spec = self.container.full_action_spec
+            specs = [action_spec.get((a, self.action_key)) for a in self.agent_keys]
+            self._mask_specs = [(i, spec) for i, spec in enumerate(specs) if isinstance(spec, ActionMask.ACCEPTED_SPECS)]
+        if not self._mask_specs:
+            return
+        mask = self._stack(tensordict, self.mask_key, self._mask_specs[0][1].device)
+        if mask is None:
+            return
+        for i, spec in self._mask_specs:
+            spec.update_mask(mask[i].bool())
+
+    def _call(self, tensordict: TensorDictBase) -> TensorDictBase:
+        self._update_specs(tensordict)
         return tensordict
 
     def _reset(self, tensordict: TensorDictBase, tensordict_reset: TensorDictBase) -> TensorDictBase:
-        action_spec = self.container.action_spec
-        for agent_key in self.agent_keys:
-            mask_path = (agent_key, self.mask_key)
-            mask = tensordict.get(mask_path, None)
-            print(mask)
-            agent_action_path = (agent_key, self.action_key)
-            agent_action_spec = action_spec.get(agent_action_path)
-            print(agent_action_spec)
-            if not isinstance(agent_action_spec, ActionMask.ACCEPTED_SPECS):
-                raise ValueError(
-                    ActionMask.SPEC_TYPE_ERROR.format(ActionMask.ACCEPTED_SPECS, type(agent_action_spec))
-                )
-            if mask is not None:
-                mask = mask.to(agent_action_spec.device)
-            agent_action_spec.update_mask(mask)
-
-         # TODO: Check that this makes sense
-        with _set_missing_tolerance(self, True):
-            tensordict_reset = self._call(tensordict_reset)
-        return tensordict_reset
\ No newline at end of file
+        self._update_specs(tensordict_reset)
+        return tensordict_reset
+
+    def _inv_call(self, tensordict: TensorDictBase) -> TensorDictBase:
+        action = self._stack(tensordict, self.action_key)
+        if action is None or not action.is_floating_point():
+            return tensordict
+        mask = self._stack(tensordict, self.mask_key, action.device)
+        if mask is None:
+            return tensordict
+        action = action.masked_fill(~mask.bool(), self.fill_value)
+        for agent_key, agent_action in zip(self.agent_keys, action.unbind(0)):
+            tensordict.set((agent_key, self.action_key), agent_action)
+        return tensordict
+
+
+if __name__ == "__main__":
+    import timeit
+    from tensordict import TensorDict
+
+    def per_agent_masked_fill(tensordict: TensorDictBase, agent_keys: List[str], device: torch.device) -> TensorDictBase:
+        # the previous implementation's pattern: one lookup, transfer and fill per agent
+        for agent_key in agent_keys:
+            mask = tensordict.get((agent_key, "action_mask")).to(device)
+            action = tensordict.get((agent_key, "action"))
+            tensordict.set((agent_key, "action"), action.masked_fill(~mask.bool(), float("-inf")))
+        return tensordict
+
+    num_actions = 5
+    for num_players, batch in [(4, 1), (4, 1024), (8, 1024)]:
+        agent_keys = [f"agent_{i}" for i in range(num_players)]
+        td = TensorDict({
+            a: TensorDict({
+                "action": torch.rand(batch, num_actions, num_players),
+                "action_mask": torch.rand(batch, num_actions, num_players) > 0.5,
+            }, batch_size=[batch])
+            for a in agent_keys
+        }, batch_size=[batch])
+        transform = NestedActionMask(agent_keys)
+        expected = per_agent_masked_fill(td.clone(), agent_keys, torch.device("cpu"))
+        result = transform._inv_call(td.clone())
+        assert all(torch.equal(expected[a, "action"], result[a, "action"]) for a in agent_keys)
+
+        number = 1000
+        loop = timeit.timeit(lambda: per_agent_masked_fill(td.clone(False), agent_keys, torch.device("cpu")), number=number)
+        stacked = timeit.timeit(lambda: transform._inv_call(td.clone(False)), number=number)
+        # the same actions as a single stacked group, as in SpyfallTorchRLEnv
+        grouped = TensorDict({"agents": torch.stack([td[a] for a in agent_keys], dim=1)}, batch_size=[batch])
+        group_transform = NestedActionMask("agents")
+        grouped_time = timeit.timeit(lambda: group_transform._inv_call(grouped.clone(False)), number=number)
+        print(
+            f"{num_players} agents, batch {batch}: per-agent loop {loop / number * 1e6:.0f}us, "
+            f"per-agent groups stacked {stacked / number * 1e6:.0f}us, single group {grouped_time / number * 1e6:.0f}us"
+        )
@@ -0,0 +1,186 @@
+"""
+Columnar dialogue log for a single Spyfall game.
+"""
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+import numpy as np
+
+ACTION_VERBS = {0: "asked", 1: "answered", 2: "accused", 3: "voted for", 4: "guessed"}
+
+# format of SpyfallEnv's dialogue entries in prompts, one sentence per line
+SENTENCE_FORMAT = "{sentence}\n"
+
+
+class HistoryWindow:
+    """
+    Rendered text of the last size turns (all turns if size is None) in one format.
+    Each new turn appends its line and drops the oldest line past size, so the
+    text is never rebuilt from the whole history.
+    """
+
+    def __init__(self, size: Optional[int] = None):
+        self.size = size
+        self.lines: Deque[str] = deque()
+        self.text = ""
+        self.turns = 0
+
+    def reset(self):
+        self.lines.clear()
+        self.text = ""
+        self.turns = 0
+
+    def push(self, line: str):
+        self.lines.append(line)
+        self.text += line
+        if self.size is not None and len(self.lines) > self.size:
+            self.text = self.text[len(self.lines.popleft()):]
+        self.turns += 1
+
+
+class TurnLog:
+    """
+    Append-only log of dialogue turns. Agent, action type and target are stored in
+    preallocated int arrays, sentences in an interned message store. The arrays are
+    reused across games, so memory per game stays flat.
+
+    Indexing returns the (agent, action_type, target, sentence) tuples of the former
+    list-based dialogue_history, so existing consumers keep working.
+    """
+
+    def __init__(self, agents: List[str], capacity: int = 128):
+        self.agents = list(agents)
+        self.agent_index = {a: i for i, a in enumerate(self.agents)}
+        self._agent = np.zeros(capacity, dtype=np.int16)
+        self._action = np.zeros(capacity, dtype=np.int16)
+        self._target = np.zeros(capacity, dtype=np.int16)
+        self._message = np.zeros(capacity, dtype=np.int32)
+        self._messages: List[str] = []
+        self._message_ids: Dict[str, int] = {}
+        self._lines: Dict[str, List[str]] = {}
+        self._windows: Dict[Tuple[str, Optional[int]], HistoryWindow] = {}
+        self._len = 0
+
+    def clear(self):
+        self._len = 0
+        self._messages.clear()
+        self._message_ids.clear()
+        self._lines.clear()
+        for window in self._windows.values():
+            window.reset()
+
+    def _grow(self):
+        for name in ("_agent", "_action", "_target", "_message"):
+            column = getattr(self, name)
+            setattr(self, name, np.concatenate([column, np.zeros_like(column)]))
+
+    def intern(self, message: str) -> int:
+        message_id = self._message_ids.get(message)
+        if message_id is None:
+            message_id = self._message_ids[message] = len(self._messages)
+            self._messages.append(message)
+        return message_id
+
+    def append(self, agent: str, action_type: int, target: str, sentence: str):
+        if self._len == len(self._agent):
+            self._grow()
+        i = self._len
+        self._agent[i] = self.agent_index[agent]
+        self._action[i] = action_type
+        self._target[i] = self.agent_index[target]
+        self._message[i] = self.intern(sentence)
+        self._len += 1
+
+    def __len__(self):
+        return self._len
+
+    def _turn(self, i: int) -> tuple:
+        return (
+            self.agents[self._agent[i]],
+            int(self._action[i]),
+            self.agents[self._target[i]],
+            self._messages[self._message[i]],
+        )
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self._turn(i) for i in range(*idx.indices(self._len))]
+        if idx < 0:
+            idx += self._len
+        if not 0 <= idx < self._len:
+            raise IndexError("turn index out of range")
+        return self._turn(idx)
+
+    def __iter__(self):
+        return (self._turn(i) for i in range(self._len))
+
+    def __repr__(self):
+        return repr(list(self))
+
+    def target(self, idx: int) -> str:
+        return self[idx][2]
+
+    def message(self, idx: int) -> str:
+        return self[idx][3]
+
+    def moves(self, k: int = None) -> np.ndarray:
+        """
+        (agent, action type, target) of the last k turns (all by default) as an (n, 3) array.
+        """
+        start = 0 if k is None else max(0, self._len - k)
+        return np.stack([self._agent[start:self._len], self._action[start:self._len], self._target[start:self._len]], axis=1)
+
+    def last(self, k: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Views of the agent, action type, target and message id columns of the last k turns.
+        """
+        start = max(0, self._len - k)
+        return (
+            self._agent[start:self._len],
+            self._action[start:self._len],
+            self._target[start:self._len],
+            self._message[start:self._len],
+        )
+
+    def _format_lines(self, fmt: str) -> List[str]:
+        # lines are formatted once per turn and format
+        lines = self._lines.setdefault(fmt, [])
+        for i in range(len(lines), self._len):
+            agent, action_type, target, sentence = self._turn(i)
+            lines.append(fmt.format(
+                agent=agent,
+                agent_idx=agent.replace("agent_", ""),
+                action=action_type,
+                verb=ACTION_VERBS[action_type],
+                target=target,
+                sentence=sentence,
+            ))
+        return lines
+
+    def window(self, k: int = None, fmt: str = SENTENCE_FORMAT) -> HistoryWindow:
+        """
+        Rolling window over the last k turns, brought up to date with the log.
+        """
+        window = self._windows.get((fmt, k))
+        if window is None:
+            window = self._windows[(fmt, k)] = HistoryWindow(k)
+        if window.turns < self._len:
+            lines = self._format_lines(fmt)
+            # only the turns that can still be in the window need to be pushed
+            if k is not None and self._len - window.turns > k:
+                window.reset()
+                window.turns = self._len - k
+            for line in lines[window.turns:self._len]:
+                window.push(line)
+        return window
+
+    def render(self, k: int = None, fmt: str = SENTENCE_FORMAT, stop: int = None) -> str:
+        """
+        Renders the last k turns before stop (all turns by default) as prompt text.
+        fmt fields: agent, agent_idx, action, verb, target, sentence.
+        """
+        if stop is None or stop == self._len:
+            return self.window(k, fmt).text
+        stop = stop if stop >= 0 else max(0, self._len + stop)
+        start = 0 if k is None else max(0, stop - k)
+        return "".join(self._format_lines(fmt)[start:stop])
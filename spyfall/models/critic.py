@@ -1,36 +1,123 @@
+from typing import List, Sequence
+
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
 from tensordict.nn import TensorDictModule
-from torchrl.envs.libs.pettingzoo import PettingZooWrapper
+from torchrl.envs import EnvBase
+
+from spyfall.models.policy import is_spy_key
 
 
 class CriticNetwork(nn.Module):
-    def __init__(self, input_dim, hidden_dim, n_agents):
+    """
+    Centralized MAPPO critic over the observations of all agents.
+
+    A trunk shared by all agents encodes each observation, the mean over agents is
+    the joint context, and a shared value head scores every agent's encoding next to
+    that context. The parameter count doesn't depend on the number of agents and all
+    agents are evaluated in one batched pass. With use_spy, each agent's encoding also
+    sees whether it is the spy, which is known during training but hidden from the policy.
+    """
+
+    def __init__(self, input_dim, hidden_dim, use_spy: bool = False):
         super(CriticNetwork, self).__init__()
-        self.fc1 = nn.Linear(input_dim, hidden_dim)
+        self.use_spy = use_spy
+        self.fc1 = nn.Linear(input_dim + int(use_spy), hidden_dim)
         self.fc2 = nn.Linear(hidden_dim, hidden_dim)
-        self.fc3 = nn.Linear(hidden_dim, n_agents)
-        self.value_head = nn.Linear(n_agents, 1)
+        self.fc3 = nn.Linear(hidden_dim * 2, hidden_dim)
+        self.value_head = nn.Linear(hidden_dim, 1)
 
-    def forward(self, x):
-        x = F.relu(self.fc1(x))
+    def forward(self, observation: torch.Tensor, is_spy: torch.Tensor = None) -> torch.Tensor:
+        """
+        observation: (*batch, n_agents, input_dim), is_spy: (*batch, n_agents) bool, required with use_spy.
+        Returns (*batch, n_agents, 1) state values.
+        """
+        if self.use_spy:
+            observation = torch.cat([observation, is_spy.unsqueeze(-1).to(observation.dtype)], dim=-1)
+        x = F.relu(self.fc1(observation))
         x = F.relu(self.fc2(x))
-        x = self.fc3(x)
-        value = self.value_head(x)
-        return value
-    
-def init_critic_module(env: PettingZooWrapper, n_agents: int, observation_dim: int) -> nn.Module:
+        context = x.mean(dim=-2, keepdim=True).expand_as(x)
+        x = F.relu(self.fc3(torch.cat([x, context], dim=-1)))
+        return self.value_head(x)
+
+
+class GroupedCritic(nn.Module):
+    """
+    Runs a CriticNetwork over agent groups stored under separate keys, as with
+    PettingZooWrapper's one group per agent. Group entries are concatenated along
+    the agent dim and the values are split back per group.
+    """
+
+    def __init__(self, critic: CriticNetwork, group_sizes: Sequence[int]):
+        super(GroupedCritic, self).__init__()
+        self.critic = critic
+        self.group_sizes = list(group_sizes)
+
+    def forward(self, *inputs: torch.Tensor):
+        """
+        inputs: the observations of every group, then their is_spy entries if the critic uses them.
+        """
+        n_groups = len(self.group_sizes)
+        observation = torch.cat(inputs[:n_groups], dim=-2)
+        is_spy = torch.cat(inputs[n_groups:], dim=-1) if len(inputs) > n_groups else None
+        values = self.critic(observation, is_spy)
+        return values.split(self.group_sizes, dim=-2)
+
+
+def init_critic_module(env: EnvBase, n_agents: int, observation_dim: int, use_spy: bool = None) -> nn.Module:
+    """
+    Centralized critic writing (group, "state_value") for every agent group of env.
+    use_spy: feed the agents' is_spy entries to the critic, defaults to
+        whether the env provides them, see is_spy_key
+    """
+    group_map = getattr(env, "group_map", None) or {"agents": list(range(n_agents))}
+    groups: List[str] = list(group_map)
+    spy_keys = [is_spy_key(env, group) for group in groups]
+    if use_spy is None:
+        use_spy = all(key is not None for key in spy_keys)
+    elif use_spy and None in spy_keys:
+        raise ValueError("use_spy needs an is_spy entry for every group")
+
     critic_net = CriticNetwork(
         input_dim=observation_dim,
         hidden_dim=observation_dim*2,
-        n_agents=n_agents
+        use_spy=use_spy
     )
+    in_keys = [(group, "observation") for group in groups]
+    if use_spy:
+        in_keys += spy_keys
+    out_keys = [(group, "state_value") for group in groups]
+
+    if len(groups) > 1:
+        critic_net = GroupedCritic(critic_net, [len(group_map[group]) for group in groups])
 
     critic_module = TensorDictModule(
         module=critic_net,
-        in_keys=[("agent_0", "observation")],
-        out_keys=[("agent_0", "state_value")]
+        in_keys=in_keys,
+        out_keys=out_keys
     )
 
-    return critic_module
\ No newline at end of file
+    return critic_module
+
+
+if __name__ == "__main__":
+    import timeit
+
+    observation_dim, batch = 128, 1024
+    with torch.no_grad():
+        for n_agents in (2, 4, 8, 16):
+            critic = CriticNetwork(observation_dim, observation_dim * 2, use_spy=True)
+            observations = torch.rand(batch, n_agents, observation_dim)
+            is_spy = torch.zeros(batch, n_agents, dtype=torch.bool)
+            is_spy[:, 0] = True
+            values = critic(observations, is_spy)
+            assert values.shape == (batch, n_agents, 1)
+
+            number = 50
+            elapsed = timeit.timeit(lambda: critic(observations, is_spy), number=number) / number
+            n_params = sum(p.numel() for p in critic.parameters())
+            print(
+                f"{n_agents} agents: {n_params} parameters, batch {batch} in {elapsed * 1e3:.2f}ms "
+                f"({elapsed / n_agents * 1e6:.0f}us per agent)"
+            )
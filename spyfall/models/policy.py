@@ -1,18 +1,22 @@
-from typing import Tuple
+from typing import Optional
 
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
 import numpy as np
+from tensordict import TensorDict
 from tensordict.nn import TensorDictModule
-from torchrl.envs.libs.pettingzoo import PettingZooWrapper
+from torchrl.envs import EnvBase
 from torchrl.modules.models.utils import _reset_parameters_recursive
 
+from spyfall.environment.masks import NUM_ACTION_TYPES
+
+SPY, NON_SPY = 0, 1
+
 
 class AgentPolicyNetwork(nn.Module):
     def __init__(self, input_size, hidden_size, num_game_actions, num_players):
         super(AgentPolicyNetwork, self).__init__()
-        print("###",input_size, hidden_size, num_game_actions, num_players)
         self.fc1 = nn.Linear(input_size, hidden_size)
         self.fc2 = nn.Linear(hidden_size, hidden_size)
         self.output_layer = nn.Linear(hidden_size, num_game_actions * num_players)
@@ -23,36 +27,53 @@ class AgentPolicyNetwork(nn.Module):
         x = F.relu(self.fc1(x))
         x = F.relu(self.fc2(x))
         action_values = self.output_layer(x)
-        action_values = action_values.view(-1, self.num_game_actions, self.num_players)
+        action_values = action_values.unflatten(-1, (self.num_game_actions, self.num_players))
         return action_values
 
     def select_action(self, observation):
-        action_values = self.policy_network(observation)
+        action_values = self(observation)
         flat_action_values = action_values.view(-1)
         max_index = torch.argmax(flat_action_values)
-        action_type, target_agent = np.unravel_index(max_index, action_values.shape)
+        action_type, target_agent = np.unravel_index(max_index.item(), action_values.shape[-2:])
         return action_type, target_agent
-    
+
 class MultiAgentSpyfallNet(nn.Module):
+    """
+    Role-conditioned policy for all agents at once.
+
+    A shared trunk encodes the observations. The spy and non-spy heads have their
+    parameters stacked with TensorDict.from_modules and are evaluated together
+    with torch.vmap; each agent takes the action values of its role's head.
+    """
+
     def __init__(
             self,
-            env: PettingZooWrapper, 
-            n_target_agents: int, 
-            observation_dim: int
+            env: Optional[EnvBase],
+            n_target_agents: int,
+            observation_dim: int,
+            num_game_actions: int = None,
         ):
+        """
+        env: reads the number of action types and targets from its "agent_0" action spec,
+            pass None to use num_game_actions and n_target_agents instead
+        """
         super(MultiAgentSpyfallNet, self).__init__()
+        if env is not None:
+            num_game_actions, n_target_agents = env.action_spec["agent_0"]["action"].shape[-2:]
         self.n_target_agents = n_target_agents
+        self.num_game_actions = num_game_actions if num_game_actions is not None else 5
         self.observation_dim = observation_dim
-
-        self.spy_network = self._build_agent_network(env, n_target_agents)
-        self.non_spy_network = self._build_agent_network(env, n_target_agents)
-
-        # self.params = TensorDict.from_modules(
-        #     *[spy_network, non_spy_network],
-        #     as_module=True
-        # )
-        # print(self.params.keys())
-        self.__dict__["_empty_net"] = self._build_agent_network(env, n_target_agents)
+        self.hidden_dim = observation_dim * 2
+
+        self.trunk = nn.Sequential(nn.Linear(observation_dim, self.hidden_dim), nn.ReLU())
+        # stacked along dim 0 in SPY, NON_SPY order
+        self.params = TensorDict.from_modules(
+            self._build_head(),
+            self._build_head(),
+            as_module=True
+        )
+        # parameter-less template the stacked parameters are swapped into
+        self.__dict__["_empty_net"] = self._build_head()
 
     @staticmethod
     def vmap_func_module(module, *args, **kwargs):
@@ -62,66 +83,163 @@ class MultiAgentSpyfallNet(nn.Module):
 
         return torch.vmap(exec_module, *args, **kwargs)
 
-    def _build_agent_network(self, env: PettingZooWrapper, n_agents: int):
+    def _build_head(self):
         return AgentPolicyNetwork(
-            input_size=self.observation_dim,
-            hidden_size=self.observation_dim * 2,
-            num_game_actions=env.action_spec["agent_0"]["action"].shape[-2],
-            num_players=env.action_spec["agent_0"]["action"].shape[-1]
+            input_size=self.hidden_dim,
+            hidden_size=self.hidden_dim,
+            num_game_actions=self.num_game_actions,
+            num_players=self.n_target_agents
         )
-    
+
     def reset_parameters(self):
         """Resets the parameters of the model."""
-
-        with self.params.to_module(self._empty_net):
-            _reset_parameters_recursive(self._empty_net)
-
-    def forward(self, *inputs: Tuple[torch.Tensor]) -> torch.Tensor:
-        print(inputs[0].shape)
-
-        if len(inputs) > 1:
-            inputs = torch.cat([*inputs], -1)
-        else:
-            inputs = inputs[0]
-        print(inputs.shape)
-
-        # non-spys share params
-        output = self.non_spy_network(inputs)
-
-        print(output)
-        return output
-
-
-def init_policy_modules(env: PettingZooWrapper, n_agents: int, observation_dim: int):
+        _reset_parameters_recursive(self.trunk)
+        for params in self.params.unbind(0):
+            with params.to_module(self._empty_net):
+                _reset_parameters_recursive(self._empty_net)
+
+    def forward(self, observation: torch.Tensor, is_spy: torch.Tensor = None) -> torch.Tensor:
+        """
+        observation: (*batch, observation_dim), is_spy: (*batch,) bool, non-spy for all agents if None.
+        Returns (*batch, num_game_actions, n_target_agents) action values.
+        """
+        hidden = self.trunk(observation)
+        # (2, *batch, num_game_actions, n_target_agents)
+        # built per call, a stored vmapped closure would make the policy unpicklable for collector workers
+        action_values = self.vmap_func_module(self._empty_net, in_dims=(0, None))(self.params, hidden)
+        if is_spy is None:
+            return action_values[NON_SPY]
+        # PettingZooWrapper passes infos as floats
+        return torch.where(is_spy.bool()[..., None, None], action_values[SPY], action_values[NON_SPY])
+
+
+def is_spy_key(env: EnvBase, group: str) -> Optional[tuple]:
+    """
+    Key of the group's is_spy entry: (group, "is_spy") for SpyfallTorchRLEnv,
+    (group, "info", "is_spy") for SpyfallEnv behind a PettingZooWrapper. None if env has neither.
+    """
+    observation_keys = env.observation_spec.keys(True)
+    for key in ((group, "is_spy"), (group, "info", "is_spy")):
+        if key in observation_keys:
+            return key
+    return None
+
+
+def masked_log_softmax(logits: torch.Tensor, mask: torch.Tensor) -> torch.Tensor:
+    """
+    Log-probabilities over the last dim with masked out entries at -inf.
+    Rows without any legal entry, e.g. agents that don't act, stay unmasked so they aren't NaN.
+    """
+    mask = mask | ~mask.any(dim=-1, keepdim=True)
+    return logits.masked_fill(~mask, float("-inf")).log_softmax(dim=-1)
+
+
+class MaskedCategoricalHead(nn.Module):
+    """
+    Flat categorical policy over action_type * n_target_agents + target. The action
+    values of a MultiAgentSpyfallNet are flattened into masked log-probabilities, to
+    be used as the logits of a Categorical distribution.
+    """
+
+    def __init__(self, network: MultiAgentSpyfallNet):
+        super(MaskedCategoricalHead, self).__init__()
+        self.network = network
+
+    def forward(
+            self,
+            observation: torch.Tensor,
+            action_mask: torch.Tensor,
+            is_spy: torch.Tensor = None
+        ) -> torch.Tensor:
+        """
+        action_mask: (*batch, num_game_actions, n_target_agents) or already flat.
+        """
+        logits = self.network(observation, is_spy).flatten(-2)
+        return masked_log_softmax(logits, action_mask.reshape(logits.shape).bool())
+
+
+def init_policy_modules(env: EnvBase, n_agents: int, observation_dim: int, categorical: bool = False):
+    """
+    One TensorDictModule per agent group, sharing a single MultiAgentSpyfallNet.
+    Agents are evaluated with their role's head, so every group needs an is_spy entry, see is_spy_key.
+
+    categorical: for envs with flat integer actions, the modules write masked
+        log-probabilities to (group, "logits") instead of action values to (group, "param")
+    """
     policy_modules = {}
 
+    group_map = getattr(env, "group_map", None) or {"agents": None}
+    first_group = next(iter(group_map))
+    if categorical:
+        num_game_actions = NUM_ACTION_TYPES
+        n_target_agents = env.full_action_spec[first_group, "action"].space.n // NUM_ACTION_TYPES
+    else:
+        num_game_actions, n_target_agents = env.full_action_spec[first_group, "action"].shape[-2:]
     policy_network = MultiAgentSpyfallNet(
-        env=env,
-        n_target_agents=n_agents,
-        observation_dim=observation_dim
+        env=None,
+        n_target_agents=n_target_agents,
+        observation_dim=observation_dim,
+        num_game_actions=num_game_actions,
     )
 
-    for group, _ in env.group_map.items():
+    module = MaskedCategoricalHead(policy_network) if categorical else policy_network
+
+    for group in group_map:
+        in_keys = [(group, "observation")]
+        if categorical:
+            in_keys.append((group, "action_mask"))
+        spy_key = is_spy_key(env, group)
+        if spy_key is None:
+            raise ValueError(f"Group {group} has no is_spy entry to select the spy or non-spy head")
+        in_keys.append(spy_key)
         policy_module = TensorDictModule(
-            policy_network,
-            in_keys=[(group, "observation")],
-            out_keys=[(group, "param")]
+            module,
+            in_keys=in_keys,
+            out_keys=[(group, "logits" if categorical else "param")]
         )
         policy_modules[group] = policy_module
 
     return policy_modules
-    
-if __name__ == "__main__":
-    policy_network = AgentPolicyNetwork(
-        input_size=10,
-        hidden_size=10,
-        num_game_actions=5,
-        num_players=4
-    )
-
-    observation = torch.rand((1,10))
-    print(observation)
-    action_values = policy_network(observation)
-    print(action_values)
-    
 
+if __name__ == "__main__":
+    import timeit
+
+    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    num_players, num_game_actions, observation_dim = 4, 5, 128
+    agent_keys = [f"agent_{i}" for i in range(num_players)]
+    net = MultiAgentSpyfallNet(None, num_players, observation_dim, num_game_actions).to(device).eval()
+    stacked_module = TensorDictModule(net, in_keys=[("agents", "observation"), ("agents", "is_spy")], out_keys=[("agents", "param")])
+
+    # the previous layout: a TensorDictModule per agent group, each evaluating its own role's network
+    spy_net, non_spy_net = net._build_head().to(device), net._build_head().to(device)
+    for params, head in zip(net.params.unbind(0), (spy_net, non_spy_net)):
+        params.to_module(head)
+    spy_module = TensorDictModule(nn.Sequential(net.trunk, spy_net), in_keys=["observation"], out_keys=["param"])
+    non_spy_module = TensorDictModule(nn.Sequential(net.trunk, non_spy_net), in_keys=["observation"], out_keys=["param"])
+
+    def per_group(td: TensorDict, spy: int) -> TensorDict:
+        for i, agent in enumerate(agent_keys):
+            (spy_module if i == spy else non_spy_module)(td[agent])
+        return td
+
+    with torch.no_grad():
+        for batch in (1, 64, 1024, 4096):
+            observations = torch.rand(batch, num_players, observation_dim, device=device)
+            # one spy per game; the per-group layout can only route a fixed agent per call
+            spy = 0
+            is_spy = torch.zeros(batch, num_players, dtype=torch.bool, device=device)
+            is_spy[:, spy] = True
+            stacked_td = TensorDict({"agents": {"observation": observations, "is_spy": is_spy}}, batch_size=[batch])
+            group_td = TensorDict({
+                agent: {"observation": observations[:, i]} for i, agent in enumerate(agent_keys)
+            }, batch_size=[batch])
+            expected = torch.stack([per_group(group_td, spy)[agent, "param"] for agent in agent_keys], dim=1)
+            assert torch.allclose(stacked_module(stacked_td)["agents", "param"], expected, atol=1e-5)
+
+            number = 100
+            looped = timeit.timeit(lambda: per_group(group_td, spy), number=number) / number
+            vmapped = timeit.timeit(lambda: stacked_module(stacked_td), number=number) / number
+            print(
+                f"{device} batch {batch}: per-group modules {looped * 1e3:.2f}ms, vmapped {vmapped * 1e3:.2f}ms, "
+                f"{batch * num_players / vmapped:.0f} agent steps/s"
+            )
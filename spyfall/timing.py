@@ -0,0 +1,74 @@
+"""
+Wall time per section, accumulated across collector worker processes.
+"""
+import time
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+from typing import Dict, Sequence
+
+import numpy as np
+
+
+class SharedClock:
+    """
+    Seconds per named section in a named shared memory block with one row per worker,
+    so envs in collector worker processes add to counters the learner can read.
+    Pickling keeps the block shared, also through the cloudpickle collectors use for
+    env constructors. Hand each worker its own row with worker(i); a row must only be
+    written from one process at a time. The creating process frees the block with close().
+    """
+
+    def __init__(self, sections: Sequence[str] = ("env", "lm"), num_workers: int = 1):
+        self.sections = list(sections)
+        self.num_workers = num_workers
+        self._row = 0
+        self._owner = True
+        self._shm = shared_memory.SharedMemory(create=True, size=num_workers * len(self.sections) * 8)
+        self._attach()
+        self._seconds[:] = 0
+
+    def _attach(self):
+        self._index = {section: i for i, section in enumerate(self.sections)}
+        self._seconds = np.ndarray((self.num_workers, len(self.sections)), dtype=np.float64, buffer=self._shm.buf)
+
+    def __getstate__(self):
+        return {"name": self._shm.name, "sections": self.sections, "num_workers": self.num_workers, "row": self._row}
+
+    def __setstate__(self, state):
+        self.sections = state["sections"]
+        self.num_workers = state["num_workers"]
+        self._row = state["row"]
+        self._owner = False
+        self._shm = shared_memory.SharedMemory(name=state["name"])
+        self._attach()
+
+    def worker(self, row: int) -> "SharedClock":
+        """
+        A clock writing to row, sharing memory with this one.
+        """
+        clock = SharedClock.__new__(SharedClock)
+        clock.__setstate__({**self.__getstate__(), "row": row})
+        return clock
+
+    def add(self, section: str, seconds: float):
+        self._seconds[self._row, self._index[section]] += seconds
+
+    @contextmanager
+    def timed(self, section: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(section, time.perf_counter() - start)
+
+    def seconds(self) -> Dict[str, float]:
+        """
+        Seconds per section, summed over workers.
+        """
+        return dict(zip(self.sections, self._seconds.sum(axis=0).tolist()))
+
+    def close(self):
+        self._seconds = None
+        self._shm.close()
+        if self._owner:
+            self._shm.unlink()
@@ -1,2 +1,246 @@
-from torchrl.envs.libs.pettingzoo import PettingZooWrapper
+"""
+MAPPO training for Spyfall.
 
+A background collector gathers the next batch while the learner trains on the
+current one. Per-agent GAE is computed on the learner device over the whole
+batch at once. Each batch fills a replay buffer of exactly frames_per_batch
+frames, which is sampled without replacement in minibatches for a few PPO
+epochs. Every batch reports frames/s, updates/s and how the time splits
+between env, LM and learner.
+
+usage: python -m spyfall.train [--env batched|dialogue] [--total-frames N] ...
+"""
+import argparse
+import inspect
+import time
+from typing import Dict, List
+
+import torch
+from tensordict import TensorDictBase
+from torch.distributions import Categorical
+from torchrl.data.replay_buffers import ReplayBuffer
+from torchrl.data.replay_buffers.samplers import SamplerWithoutReplacement
+from torchrl.data.replay_buffers.storages import LazyTensorStorage
+from torchrl.envs import EnvBase
+from torchrl.modules import ProbabilisticActor
+from torchrl.objectives import ClipPPOLoss, ValueEstimators
+
+from spyfall.collectors import make_batched_env_fn, make_collector, make_env_fn
+from spyfall.models.critic import init_critic_module
+from spyfall.models.policy import init_policy_modules
+from spyfall.timing import SharedClock
+
+# renamed from entropy_coef in torchrl 0.11
+ENTROPY_COEF_ARG = "entropy_coeff" if "entropy_coeff" in inspect.signature(ClipPPOLoss).parameters else "entropy_coef"
+
+
+def agent_groups(env: EnvBase) -> List[str]:
+    group_map = getattr(env, "group_map", None)
+    return list(group_map) if group_map else ["agents"]
+
+
+def make_actors(env: EnvBase, n_agents: int, observation_dim: int) -> Dict[str, ProbabilisticActor]:
+    """
+    Categorical actors over flat actions, one per agent group, sharing the policy network.
+    """
+    policy_modules = init_policy_modules(env, n_agents, observation_dim, categorical=True)
+    return {
+        group: ProbabilisticActor(
+            module=policy_modules[group],
+            spec=env.full_action_spec[group, "action"],
+            in_keys={"logits": (group, "logits")},
+            out_keys=[(group, "action")],
+            distribution_class=Categorical,
+            return_log_prob=True,
+            log_prob_key=(group, "sample_log_prob"),
+        )
+        for group in agent_groups(env)
+    }
+
+
+def make_losses(actors: Dict[str, ProbabilisticActor], critic, args) -> Dict[str, ClipPPOLoss]:
+    """
+    A ClipPPOLoss with a GAE value estimator per agent group, all sharing the critic.
+    """
+    losses = {}
+    for group, actor in actors.items():
+        loss = ClipPPOLoss(
+            actor_network=actor,
+            critic_network=critic,
+            clip_epsilon=args.clip_epsilon,
+            entropy_bonus=args.entropy_coef > 0,
+            normalize_advantage=False,
+            **{ENTROPY_COEF_ARG: args.entropy_coef},
+        )
+        loss.set_keys(
+            reward=(group, "reward"),
+            action=(group, "action"),
+            sample_log_prob=(group, "sample_log_prob"),
+            value=(group, "state_value"),
+            done=(group, "done"),
+            terminated=(group, "terminated"),
+            advantage=(group, "advantage"),
+            value_target=(group, "value_target"),
+        )
+        loss.make_value_estimator(ValueEstimators.GAE, gamma=args.gamma, lmbda=args.lmbda)
+        losses[group] = loss
+    return losses
+
+
+def expand_done(batch: TensorDictBase, group: str):
+    """
+    Copies the game's done and terminated flags to every agent of group, if the env
+    only provides them per game. GAE needs them shaped like the agents' rewards.
+    """
+    next_td = batch.get("next")
+    reward_shape = next_td.get((group, "reward")).shape
+    for key in ("done", "terminated"):
+        if next_td.get((group, key), None) is None:
+            flag = next_td.get(key)
+            next_td.set((group, key), flag.unsqueeze(-1).expand(*flag.shape[:-1], *reward_shape[flag.dim() - 1:]))
+
+
+@torch.no_grad()
+def compute_advantages(batch: TensorDictBase, losses: Dict[str, ClipPPOLoss]):
+    """
+    Vectorized GAE over the time dim of batch, for every agent of every group.
+    Only the agent that acts in a step gets an advantage; the actions of the others
+    are never applied, so their policy gradient would be noise.
+    The loss itself is not masked: the entropy bonus applies to every agent at every
+    step, and the value loss is computed for every agent of every group, so idle
+    agents' values are trained towards their returns too.
+    """
+    for group, loss in losses.items():
+        expand_done(batch, group)
+        loss.value_estimator(
+            batch,
+            params=loss.critic_network_params,
+            target_params=loss.target_critic_network_params,
+        )
+        for key in ("selected", "mask"):
+            acting = batch.get((group, key), None)
+            if acting is not None:
+                advantage = batch.get((group, "advantage"))
+                batch.set((group, "advantage"), advantage * acting.reshape(advantage.shape).to(advantage.dtype))
+                break
+
+
+def train(args):
+    torch.manual_seed(args.seed)
+    device = torch.device(args.device or ("cuda" if torch.cuda.is_available() else "cpu"))
+    clock = SharedClock(num_workers=args.workers)
+
+    # one constructor per worker, each adding to its own row of the clock
+    if args.env == "batched":
+        env_fns = [
+            make_batched_env_fn(
+                args.num_games, args.num_players, args.observation_dim, device,
+                categorical_actions=True, clock=clock.worker(i), seed=args.seed + i,
+            )
+            for i in range(args.workers)
+        ]
+    else:
+        env_fns = [
+            make_env_fn(
+                args.num_players, args.observation_dim, device,
+                categorical_actions=True, symbolic=args.symbolic, clock=clock.worker(i),
+            )
+            for i in range(args.workers)
+        ]
+    # only used for the specs
+    env = env_fns[0]()
+
+    actors = make_actors(env, args.num_players, args.observation_dim)
+    critic = init_critic_module(env, args.num_players, args.observation_dim)
+    losses = make_losses(actors, critic, args)
+    parameters = list({id(p): p for loss in losses.values() for p in loss.parameters()}.values())
+    optimizer = torch.optim.Adam(parameters, lr=args.lr)
+    policy = next(iter(actors.values())) if len(actors) == 1 else _sequential(actors)
+
+    collector = make_collector(
+        policy,
+        num_workers=args.workers,
+        num_players=args.num_players,
+        observation_dim=args.observation_dim,
+        frames_per_batch=args.frames_per_batch,
+        total_frames=args.total_frames,
+        device=device,
+        background=True,
+        env_fn=env_fns,
+    )
+    replay_buffer = ReplayBuffer(
+        storage=LazyTensorStorage(args.frames_per_batch, device=device),
+        sampler=SamplerWithoutReplacement(),
+        batch_size=args.minibatch_size,
+    )
+    minibatches = max(args.frames_per_batch // args.minibatch_size, 1)
+
+    start = time.perf_counter()
+    frames = updates = 0
+    wait = learner = 0.0
+    last = start
+    for batch in collector:
+        ready = time.perf_counter()
+        wait += ready - last
+
+        batch = batch.to(device)
+        compute_advantages(batch, losses)
+        replay_buffer.extend(batch.reshape(-1))
+        for _ in range(args.epochs):
+            for _ in range(minibatches):
+                sample = replay_buffer.sample()
+                loss = 0
+                for group_loss in losses.values():
+                    loss_vals = group_loss(sample)
+                    loss = loss + sum(value for key, value in loss_vals.items() if key.startswith("loss_"))
+                optimizer.zero_grad()
+                loss.backward()
+                torch.nn.utils.clip_grad_norm_(parameters, args.max_grad_norm)
+                optimizer.step()
+                updates += 1
+        collector.update_policy_weights_()
+
+        last = time.perf_counter()
+        learner += last - ready
+        frames += batch.numel()
+        elapsed = last - start
+        clocks = clock.seconds()
+        reward = sum(batch.get(("next", group, "reward")).sum() for group in losses).item()
+        print(
+            f"frames {frames}: {frames / elapsed:.0f} frames/s, {updates / elapsed:.1f} updates/s | "
+            f"env {clocks['env'] - clocks['lm']:.2f}s, lm {clocks['lm']:.2f}s (summed over workers), "
+            f"learner {learner:.2f}s, waiting on collector {wait:.2f}s | "
+            f"loss {loss.item():.3f}, reward {reward / batch.numel():.3f}/frame"
+        )
+    collector.shutdown()
+    clock.close()
+
+
+def _sequential(actors: Dict[str, ProbabilisticActor]):
+    from tensordict.nn import TensorDictSequential
+
+    return TensorDictSequential(*actors.values())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--env", choices=["batched", "dialogue"], default="batched",
+                        help="batched: rules-only SpyfallTorchRLEnv, dialogue: wrapped SpyfallEnv")
+    parser.add_argument("--symbolic", action="store_true", help="dialogue env without text generation")
+    parser.add_argument("--num-games", type=int, default=256, help="games per batched env")
+    parser.add_argument("--num-players", type=int, default=4)
+    parser.add_argument("--observation-dim", type=int, default=64)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--frames-per-batch", type=int, default=256 * 32)
+    parser.add_argument("--total-frames", type=int, default=256 * 32 * 10)
+    parser.add_argument("--epochs", type=int, default=4)
+    parser.add_argument("--minibatch-size", type=int, default=1024)
+    parser.add_argument("--lr", type=float, default=3e-4)
+    parser.add_argument("--gamma", type=float, default=0.99)
+    parser.add_argument("--lmbda", type=float, default=0.95)
+    parser.add_argument("--clip-epsilon", type=float, default=0.2)
+    parser.add_argument("--entropy-coef", type=float, default=0.01)
+    parser.add_argument("--max-grad-norm", type=float, default=1.0)
+    parser.add_argument("--device", default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    train(parser.parse_args())
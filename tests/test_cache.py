@@ -0,0 +1,90 @@
+"""
+ResponseCache keys, sample indices, replay and eviction.
+"""
+import dspy
+import pytest
+
+from spyfall.agents.cache import CacheMiss, ResponseCache
+from spyfall.agents.modules.dialogue import predict
+from spyfall.agents.signatures.guess import Guess
+from spyfall.environment.locations import load_catalog
+from spyfall.environment.spyfall_env import SpyfallEnv
+
+INPUTS = dict(num_players="4", current_player="Player 1", dialogue_history="", locations="Airplane\nBank")
+
+
+class RecordingPredictor:
+    """
+    Stands in for dspy.Predict, answers with the temperature it was created with.
+    """
+    calls = []
+
+    def __init__(self, signature, temperature):
+        self.temperature = temperature
+
+    def __call__(self, **inputs):
+        RecordingPredictor.calls.append(self.temperature)
+        return dspy.Prediction(guess=f"sample at {self.temperature}")
+
+
+def test_two_games_get_distinct_samples(tmp_path):
+    cache = ResponseCache(str(tmp_path / "responses.sqlite"))
+    env = SpyfallEnv(4, 16, locations=load_catalog().to_dicts(), symbolic=True, response_cache=cache)
+    RecordingPredictor.calls = []
+    guesses = []
+    for _ in range(2):
+        env.reset()
+        prediction = predict(Guess, env.dialogue_agent.cache, predictor=RecordingPredictor, **INPUTS)
+        guesses.append(prediction.guess)
+    # the second game misses the cache and samples at another temperature
+    assert len(set(RecordingPredictor.calls)) == 2
+    assert guesses[0] != guesses[1]
+    assert cache.stats()["entries"] == 2
+    cache.close()
+
+
+def test_rerun_replays_the_same_keys(tmp_path):
+    path = str(tmp_path / "responses.sqlite")
+    cache = ResponseCache(path)
+    keys = [cache.key("Guess", INPUTS, cache.next_sample_index("Guess", INPUTS)) for _ in range(3)]
+    for key in keys:
+        cache.put(key, {"guess": key})
+    cache.close()
+
+    replay = ResponseCache(path, mode="replay")
+    assert [replay.get(replay.key("Guess", INPUTS, replay.next_sample_index("Guess", INPUTS)))["guess"]
+            for _ in range(3)] == keys
+    with pytest.raises(CacheMiss):
+        replay.get(replay.key("Guess", INPUTS, replay.next_sample_index("Guess", INPUTS)))
+    replay.close()
+
+
+def test_sample_counts_are_bounded():
+    cache = ResponseCache(mode="off", max_sample_counts=2)
+    assert [cache.next_sample_index("Guess", INPUTS) for _ in range(2)] == [0, 1]
+    cache.next_sample_index("Guess", dict(INPUTS, current_player="Player 2"))
+    assert cache.next_sample_index("Guess", INPUTS) == 2
+    # two other requests push the first one out
+    cache.next_sample_index("Guess", dict(INPUTS, current_player="Player 3"))
+    cache.next_sample_index("Guess", dict(INPUTS, current_player="Player 4"))
+    assert cache.next_sample_index("Guess", INPUTS) == 0
+
+
+def test_normalized_inputs_share_keys():
+    cache = ResponseCache(mode="off")
+    spaced = dict(INPUTS, dialogue_history="  Player 1:\n hello ")
+    assert cache.key("Guess", spaced, 0) == cache.key("Guess", dict(INPUTS, dialogue_history="Player 1: hello"), 0)
+    assert cache.key("Guess", INPUTS, 0) != cache.key("Guess", INPUTS, 1)
+
+
+def test_eviction_keeps_recent_hits(tmp_path):
+    cache = ResponseCache(str(tmp_path / "responses.sqlite"), max_bytes=50)
+    cache.put("old", {"guess": "Airplane"})
+    cache.put("recent", {"guess": "Bank"})
+    assert cache.get("old") is not None
+    # over budget, the least recently used entry is dropped
+    cache.put("new", {"guess": "Casino"})
+    assert cache.evictions == 1
+    assert cache.get("recent") is None
+    assert cache.get("old") is not None
+    cache.close()
@@ -0,0 +1,75 @@
+"""
+SpyfallEnv and BatchedSpyfallEnv play the same games to the same outcomes.
+"""
+import random
+
+import numpy as np
+import pytest
+
+from spyfall.environment.batched_env import BatchedSpyfallEnv
+from spyfall.environment.locations import load_catalog
+from spyfall.environment.spyfall_env import SpyfallEnv
+from spyfall.environment.symbolic import SymbolicResponder
+
+NUM_PLAYERS = 4
+
+
+class ScriptedResponder(SymbolicResponder):
+    """
+    Votes and guesses drawn from its own generator, so the batched env can replay them.
+    """
+    def __init__(self, seed: int):
+        super().__init__()
+        self.rng = np.random.default_rng(seed)
+
+    def respond(self, action_type, location, locations):
+        if action_type == 3:
+            return "Yes" if self.rng.random() < 0.8 else "No"
+        elif action_type == 4:
+            return location if self.rng.random() < 0.5 else ""
+        return ""
+
+
+def scripted_outcomes(seed: int):
+    rng = np.random.default_rng(seed)
+    vote_fn = lambda games, voters, accused: rng.random(len(games)) < 0.8
+    guess_fn = lambda games, spies: rng.random(len(games)) < 0.5
+    return vote_fn, guess_fn
+
+
+@pytest.mark.parametrize("seed", range(200))
+def test_batched_env_matches_spyfall_env(seed):
+    catalog = load_catalog()
+    env = SpyfallEnv(
+        NUM_PLAYERS, 16, locations=catalog.to_dicts(), symbolic=True,
+        responder=ScriptedResponder(seed), categorical_actions=True
+    )
+    vote_fn, guess_fn = scripted_outcomes(seed)
+    batched = BatchedSpyfallEnv(1, NUM_PLAYERS, 16, locations=catalog, vote_fn=vote_fn, guess_fn=guess_fn, seed=seed)
+
+    random.seed(seed)
+    env.reset()
+    batched.reset()
+    batched.location[0] = catalog.index(env.location)
+    batched.spy_idx[0] = env.agent_index[env.spy_idx]
+
+    actions = np.random.default_rng(seed)
+    last_target = -1
+    while not batched.done[0]:
+        agent = env.agent_index[env.agent_selection]
+        assert batched.agent_selection[0] == agent
+        mask = env.infos[env.agent_selection]["action_mask"].numpy()
+        np.testing.assert_array_equal(batched.action_masks[0, agent].reshape(-1), mask)
+
+        # asking the last target again resamples the target from each env's own generator
+        legal = [a for a in np.flatnonzero(mask) if a >= NUM_PLAYERS or a != last_target]
+        action = int(actions.choice(legal))
+        last_target = action % NUM_PLAYERS
+
+        _, rewards, terminations, truncations, _ = env.step(action)
+        _, batched_rewards, batched_terminations, batched_truncations, _ = batched.step(np.array([action]))
+        np.testing.assert_array_equal(batched_rewards[0], [rewards[a] for a in env.possible_agents])
+        np.testing.assert_array_equal(batched_terminations[0], [terminations[a] for a in env.possible_agents])
+        np.testing.assert_array_equal(batched_truncations[0], [truncations[a] for a in env.possible_agents])
+
+    assert all(env.terminations.values())
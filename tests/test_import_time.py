@@ -0,0 +1,16 @@
+"""
+The core environment imports within scripts/check_import_time.py's budget and without the LM stack.
+"""
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_import_time():
+    result = subprocess.run(
+        [sys.executable, os.path.join(ROOT, "scripts", "check_import_time.py")],
+        cwd=ROOT, capture_output=True, text=True,
+    )
+    assert result.returncode == 0, result.stdout + result.stderr
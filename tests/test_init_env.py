@@ -0,0 +1,15 @@
+"""
+init_env builds a torchrl env on the installed torchrl.
+"""
+import torch
+
+from spyfall.environment.spyfall_env import init_env
+
+
+def test_wrapped_env_rollout():
+    env = init_env(4, 32, torch.device("cpu"), symbolic=True, categorical_actions=True)
+    rollout = env.rollout(10, break_when_any_done=False)
+    assert rollout.batch_size == torch.Size([10])
+    for group in env.group_map:
+        assert rollout[group, "observation"].shape[-1] == 32
+        assert (group, "info", "is_spy") in rollout.keys(True)
@@ -0,0 +1,26 @@
+"""
+Parsing of free-text judge scores.
+"""
+import pytest
+
+from spyfall.agents.parsing import ParseStats, parse_score
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("7/10", 0.7),
+    ("Score: 7 / 10", 0.7),
+    ("0.7", 0.7),
+    ('{"score": 0.75}', 0.75),
+    ("Score: 0.6/1.0", 0.6),
+    ("1.5", None),
+    ("2", None),
+    ("no number", None),
+])
+def test_parse_score(text, expected):
+    stats = ParseStats()
+    value = parse_score(text, stats)
+    if expected is None:
+        assert value is None
+    else:
+        assert value == pytest.approx(expected)
+    assert stats.failures["score"] == (expected is None)
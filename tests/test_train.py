@@ -0,0 +1,24 @@
+"""
+One small training batch runs end to end on both env types.
+"""
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SMALL_BATCH = ["--frames-per-batch", "128", "--total-frames", "128", "--minibatch-size", "64", "--epochs", "1"]
+
+
+@pytest.mark.parametrize("env_args", [
+    ["--env", "batched", "--num-games", "16"],
+    ["--env", "dialogue", "--symbolic"],
+])
+def test_train_one_batch(env_args):
+    result = subprocess.run(
+        [sys.executable, "-m", "spyfall.train", *env_args, *SMALL_BATCH],
+        cwd=ROOT, capture_output=True, text=True, timeout=600,
+    )
+    assert result.returncode == 0, result.stdout + result.stderr
+    assert "frames 128:" in result.stdout